@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import argparse
+import traceback
+import multiprocessing
+import concurrent.futures
+
+from FontieException import FontieException
+from FontiePackage import FontiePackage
+
+BATCH_WORKERS = os.cpu_count() or 1
+BATCH_EXTENSIONS = [".ttf", ".otf", ".sfd", ".woff", ".woff2", ".pfb", ".ufo"]
+
+def _list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+# NOTE A manifest lists one font per line, relative paths are resolved from
+#      the directory of the manifest and lines starting with # are ignored
+def sources(input):
+    if os.path.isdir(input):
+        result = []
+        for root, dirnames, filenames in os.walk(input):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in BATCH_EXTENSIONS:
+                    result.append(os.path.join(root, filename))
+        return result
+    result = []
+    with open(input, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                result.append(os.path.join(os.path.dirname(os.path.abspath(input)), line))
+    return result
+
+# NOTE Runs inside a worker process of the pool, so it only returns plain
+#      values and never raises
+def convert(source, path, options):
+    timings = {}
+    current = [None, time.time()]
+    def listener(stage):
+        now = time.time()
+        if current[0]:
+            timings[current[0]] = timings.get(current[0], 0) + now - current[1]
+        current[0] = stage
+        current[1] = now
+    start = time.time()
+    package = None
+    try:
+        package = FontiePackage(path=path)
+        package.listener = listener
+        package.load(source)
+        package.make(options, cache=False)
+        listener(None)
+        return (source, path, time.time() - start, timings, None)
+    except FontieException as e:
+        message = e.message
+    except Exception as e:
+        traceback.print_exc()
+        message = str(e) or e.__class__.__name__
+    if package != None:
+        package.destroy(False)
+    return (source, path, time.time() - start, timings, message)
+
+# INFO Converts a library of fonts without the HTTP server
+#
+#      Every font is built into a package of its own below the output
+#      directory, using the same options as a package request. The fonts are
+#      read in place and the packages are written straight to the output
+#      directory, so nothing is copied to the originals or the packages of
+#      the server. The packages are built on a pool of processes and the
+#      result of every font is printed as soon as it is done.
+class FontieBatch:
+    def __init__(self, workers=BATCH_WORKERS):
+        self.workers = workers
+
+    # NOTE Fonts with the same name get distinct packages, but an existing
+    #      package is never overwritten
+    def _path(self, output, source, used):
+        name = os.path.splitext(os.path.basename(source))[0]
+        path = os.path.join(output, name)
+        i = 1
+        while path in used:
+            i += 1
+            path = os.path.join(output, "%s-%d" % (name, i))
+        used.add(path)
+        return path
+
+    def run(self, input, output, options):
+        fonts = sources(input)
+        os.makedirs(output, exist_ok=True)
+        used = set()
+        tasks = [(source, self._path(output, source, used)) for source in fonts]
+        print("Converting %d fonts with %d workers..." % (len(tasks), self.workers))
+        results = []
+        start = time.time()
+        context = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(max(1, min(self.workers, len(tasks))), mp_context=context) as executor:
+            futures = [executor.submit(convert, source, path, options) for source, path in tasks]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results.append(result)
+                source, path, duration, timings, message = result
+                stages = " ".join("%s=%.2fs" % (stage, timings[stage]) for stage in timings)
+                print("[%d/%d] %s %.2fs %s %s" % (len(results), len(tasks), source, duration, "failed: %s" % message if message else "ok", stages))
+                sys.stdout.flush()
+        self.summary(results, time.time() - start)
+        return 1 if any(result[4] for result in results) else 0
+
+    def summary(self, results, elapsed):
+        done = [result for result in results if not result[4]]
+        print("")
+        print("%d converted, %d failed in %.2fs" % (len(done), len(results) - len(done), elapsed))
+        if not done:
+            return
+        stages = {}
+        for source, path, duration, timings, message in done:
+            for stage, value in timings.items():
+                stages.setdefault(stage, []).append(value)
+        print("%-12s %10s %10s %10s" % ("stage", "total", "mean", "max"))
+        for stage, values in stages.items():
+            print("%-12s %9.2fs %9.2fs %9.2fs" % (stage, sum(values), sum(values) / len(values), max(values)))
+        print("Slowest fonts:")
+        for source, path, duration, timings, message in sorted(done, key=lambda result: -result[2])[:5]:
+            print("  %8.2fs %s" % (duration, source))
+        for source, path, duration, timings, message in results:
+            if message:
+                print("Failed: %s (%s)" % (source, message))
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="fontie batch", description="Converts a directory or manifest of fonts into packages")
+    parser.add_argument("input", help="directory of fonts or manifest with one font per line")
+    parser.add_argument("output", help="directory the packages are written to")
+    parser.add_argument("--fixes", type=_list, help="comma-separated fixes, e.g. name,glyphs,references,metrics")
+    parser.add_argument("--hinting", help="hinting method, e.g. gdi, directwrite, grayscale or nohint")
+    parser.add_argument("--ranges", action="append", help="unicode ranges to keep, e.g. 0020-007F,20AC")
+    parser.add_argument("--shards", type=_list, help="comma-separated shards, e.g. latin,latin-ext,cyrillic,greek")
+    parser.add_argument("--output", dest="formats", type=_list, default=["ttf", "woff", "woff2"], help="comma-separated output formats")
+    parser.add_argument("--css", type=_list, help="comma-separated css options, e.g. create,group,base64,local")
+    parser.add_argument("--html", type=_list, help="comma-separated html options, e.g. create,fontsmoothie")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="number of fonts converted at the same time")
+    args = parser.parse_args(argv)
+    options = {'output': args.formats}
+    for name in ['fixes', 'hinting', 'ranges', 'shards', 'css', 'html']:
+        if getattr(args, name):
+            options[name] = getattr(args, name)
+    return FontieBatch(args.workers).run(args.input, args.output, options)
@@ -0,0 +1,189 @@
+import os
+import shutil
+import uuid
+import json
+import time
+import fcntl
+import hashlib
+import traceback
+
+STATS_NAME = ".stats"
+TMP_PREFIX = ".tmp-"
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        chunk = file.read(65536)
+        while chunk:
+            digest.update(chunk)
+            chunk = file.read(65536)
+    return digest.hexdigest()
+
+def path_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return size
+
+# NOTE Increments the counters of a JSON stats file under an exclusive lock,
+#      or sets them to the given values if reset is True
+def count_stats(path, reset=False, **increments):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            file.seek(0)
+            data = file.read()
+            stats = json.loads(data) if data else {}
+            for name, value in increments.items():
+                stats[name] = value if reset else stats.get(name, 0) + value
+            file.seek(0)
+            file.truncate()
+            file.write(json.dumps(stats))
+            file.flush()
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+def read_stats(path):
+    try:
+        with open(path, 'r') as file:
+            data = file.read()
+        return json.loads(data) if data else {}
+    except (OSError, ValueError):
+        return {}
+
+# INFO Persistent content-addressed cache on disk
+#
+#      Every entry is a file or a directory named after its key. The mtime of
+#      an entry is updated on every hit, so eviction by age and by size both
+#      drop the least recently used entries first. The hit/miss counters are
+#      kept in a locked stats file, since the requests are handled by forked
+#      children that do not share any memory with each other. The optional
+#      account function is called with the bytes added or removed by every
+#      store and eviction.
+class FontieCache:
+    def __init__(self, root, max_size, max_age, account=None):
+        self.root = root
+        self.max_size = max_size
+        self.max_age = max_age
+        self.account = account
+
+    def _account(self, delta):
+        if self.account and delta:
+            self.account(delta)
+
+    def _count(self, **increments):
+        count_stats(os.path.join(self.root, STATS_NAME), **increments)
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                entries.append((os.path.getmtime(path), path_size(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        return entries
+
+    def _remove(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    def key(self, *parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                digest.update(part)
+            else:
+                digest.update(json.dumps(part, sort_keys=True).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                size = path_size(path)
+                self._remove(path)
+                self._account(-size)
+                raise FileNotFoundError(path)
+            os.utime(path)
+        except OSError:
+            self._count(misses=1)
+            return None
+        self._count(hits=1)
+        return path
+
+    def put(self, key, src):
+        path = os.path.join(self.root, key)
+        tmppath = os.path.join(self.root, "%s%s" % (TMP_PREFIX, uuid.uuid4()))
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            if os.path.isdir(src):
+                shutil.copytree(src, tmppath)
+            else:
+                shutil.copyfile(src, tmppath)
+            os.utime(tmppath)
+            size = path_size(tmppath)
+            existed = os.path.lexists(path)
+            os.rename(tmppath, path)
+            if not existed:
+                self._account(size)
+        except OSError:
+            # NOTE Another process might have stored the same key meanwhile
+            if os.path.exists(tmppath):
+                self._remove(tmppath)
+            if not os.path.exists(path):
+                raise
+        self._count(stores=1)
+        self.evict()
+        return path
+
+    def evict(self):
+        evictions = 0
+        reclaimed = 0
+        entries = self._entries()
+        total = sum(entry[1] for entry in entries)
+        now = time.time()
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_size:
+                break
+            try:
+                self._remove(path)
+                evictions += 1
+                reclaimed += size
+                total -= size
+            except OSError:
+                traceback.print_exc()
+        if evictions:
+            self._count(evictions=evictions, reclaimed=reclaimed)
+            self._account(-reclaimed)
+
+    def stats(self):
+        stats = read_stats(os.path.join(self.root, STATS_NAME))
+        entries = self._entries()
+        result = {
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'stores': stats.get('stores', 0),
+            'evictions': stats.get('evictions', 0),
+            'reclaimed': stats.get('reclaimed', 0),
+            'entries': len(entries),
+            'size': sum(entry[1] for entry in entries),
+            'max_size': self.max_size,
+            'max_age': self.max_age
+        }
+        return result
@@ -0,0 +1,51 @@
+import struct
+
+from FontieWoff import read_sfnt
+
+# REF https://www.w3.org/submissions/EOT/
+
+EOT_VERSION = 0x00020001
+EOT_MAGIC = 0x504C
+DEFAULT_CHARSET = 1
+
+# NOTE EOT stores the names as UTF-16LE, while the name table uses UTF-16BE
+def _name(table, id):
+    if not table:
+        return b""
+    count, offset = struct.unpack(">HH", table[2:6])
+    fallback = b""
+    for i in range(count):
+        platform, encoding, language, name, length, start = struct.unpack(">HHHHHH", table[6 + 12*i:18 + 12*i])
+        if platform != 3 or encoding not in [0, 1] or name != id:
+            continue
+        value = table[offset + start:offset + start + length]
+        value = bytes(b for pair in zip(value[1::2], value[0::2]) for b in pair)
+        if language == 0x0409:
+            return value
+        if not fallback:
+            fallback = value
+    return fallback
+
+# NOTE Writes an uncompressed EOT, which is the OS/2 and name information
+#      followed by the unchanged TTF data
+def eot(data):
+    flavor, tables = read_sfnt(data)
+    os2 = tables[b"OS/2"][1] if b"OS/2" in tables else b"\0" * 78
+    names = tables[b"name"][1] if b"name" in tables else None
+    weight, fstype = struct.unpack(">H2xH", os2[4:10])
+    panose = os2[32:42]
+    unicode_range = struct.unpack(">4I", os2[42:58])
+    selection = struct.unpack(">H", os2[62:64])[0]
+    codepage_range = struct.unpack(">2I", os2[78:86]) if len(os2) >= 86 else (0, 0)
+    adjustment = struct.unpack(">I", tables[b"head"][1][8:12])[0]
+    strings = b""
+    for id in [1, 2, 5, 4]:
+        name = _name(names, id)
+        strings += struct.pack("<HH", 0, len(name)) + name
+    # NOTE The root string is empty, so the font is not restricted to sites
+    strings += struct.pack("<HH", 0, 0)
+    size = 80 + len(strings) + len(data)
+    header = struct.pack("<IIII", size, len(data), EOT_VERSION, 0)
+    header += panose + struct.pack("<BBIHH", DEFAULT_CHARSET, selection & 0x01, weight, fstype, EOT_MAGIC)
+    header += struct.pack("<4I2II4I", *(unicode_range + codepage_range + (adjustment, 0, 0, 0, 0)))
+    return header + strings + data
@@ -4,3 +4,7 @@ class FontieException(Exception):
         self.code = code
         self.message = message
         self.original_exception = original_exception
+
+    # NOTE Allows the exception to be passed back from a worker process
+    def __reduce__(self):
+        return (FontieException, (self.code, self.message, self.original_exception))
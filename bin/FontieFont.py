@@ -1,77 +1,207 @@
 import os
+import time
 import shutil
 import glob
 import uuid
 import fontforge
 import re
 import traceback
+import subprocess
+import hashlib
+import struct
 
 from FontieException import FontieException
+from FontieCache import FontieCache, file_digest
+from FontieRange import FontieRange
+from FontieWoff import woff, woff2, brotli
+from FontieEot import eot
+from FontieSvg import svg
+from FontieMetrics import METRICS_STORE
+from FontieWorkspace import FontieWorkspace, check_quota, track, FONT_ROOT, FONT_PREFIX
 
-FONT_ROOT = "/tmp"
-FONT_PREFIX = "font_"
-EOTFAST = "WINEDLLOVERRIDES=\"t2embed.dll=n\" wine /opt/eotfast/EOTFAST-1.EXE"
-SCOUR = "scour --indent=none --remove-metadata --quiet"
 TTFAUTOHINT = "ttfautohint --windows-compatibility"
+HINT_CACHE_ROOT = os.environ.get("FONTIE_HINT_CACHE_ROOT", "/tmp/fontie-hint-cache")
+HINT_CACHE_MAX_SIZE = 256*1024*1024
+HINT_CACHE_MAX_AGE = 7*24*60*60
 WOFF2 = "/opt/woff2/woff2_compress"
-FIXLOOKUPS = "/opt/fontie/helper/fix_lookups.ff"
+# NOTE Compression levels of the native WOFF (zlib, 0-9) and WOFF2 (brotli,
+#      0-11) encoders, lower values trade file size for CPU time
+WOFF_LEVEL = 9
+WOFF2_QUALITY = 11
+
+METRICS = [
+    'os2_winascent', 'os2_winascent_add', 'os2_windescent', 'os2_windescent_add',
+    'os2_typoascent', 'os2_typoascent_add', 'os2_typodescent', 'os2_typodescent_add',
+    'os2_typolinegap', 'hhea_ascent', 'hhea_ascent_add', 'hhea_descent',
+    'hhea_descent_add', 'hhea_linegap'
+]
+
+# REF https://learn.microsoft.com/en-us/typography/opentype/spec/os2#uswidthclass
+STRETCHES = {
+    1: 'ultra-condensed',
+    2: 'extra-condensed',
+    3: 'condensed',
+    4: 'semi-condensed',
+    5: 'normal',
+    6: 'semi-expanded',
+    7: 'expanded',
+    8: 'extra-expanded',
+    9: 'ultra-expanded'
+}
+
+CHUNK_SIZE = 65536
+
+# NOTE Hinted TTFs by the digest of the unhinted TTF and the arguments of
+#      ttfautohint, so the same font is hinted only once per method
+HINT_CACHE = FontieCache(HINT_CACHE_ROOT, HINT_CACHE_MAX_SIZE, HINT_CACHE_MAX_AGE)
+_ttfautohint_version = None
+
+# NOTE Digest of a TTF without the timestamps and the checksums of its head
+#      and FFTM tables, since fontforge writes the current time into every
+#      TTF it generates and the same glyphs would never produce the same digest
+# REF https://fontforge.org/docs/techref/non-standard.html#fftm-table
+TIMESTAMPS = {
+    b"head": [(8, 12), (20, 36)],
+    b"FFTM": [(4, 28)]
+}
+
+def ttf_digest(path):
+    with open(path, 'rb') as file:
+        data = bytearray(file.read())
+    if len(data) >= 12:
+        count = struct.unpack(">H", data[4:6])[0]
+        for i in range(count):
+            record = 12 + 16 * i
+            tag = bytes(data[record:record + 4])
+            if not tag in TIMESTAMPS or len(data) < record + 16:
+                continue
+            offset = struct.unpack(">I", data[record + 8:record + 12])[0]
+            data[record + 4:record + 8] = bytes(4)
+            for start, end in TIMESTAMPS[tag]:
+                if len(data) >= offset + end:
+                    data[offset + start:offset + end] = bytes(end - start)
+    return hashlib.sha256(data).hexdigest()
+
+# NOTE Part of the cache key, so an update of ttfautohint does not return
+#      the results of the previous version
+def ttfautohint_version():
+    global _ttfautohint_version
+    if _ttfautohint_version == None:
+        try:
+            _ttfautohint_version = subprocess.run(["ttfautohint", "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode("utf-8", "replace").strip()
+        except OSError:
+            _ttfautohint_version = ""
+    return _ttfautohint_version
+
+# NOTE The digest of an uploaded original is stored next to it, so it does not
+#      need to be computed again by every following build
+def _digest_path(orig):
+    return "%s_digest" % orig[:-len("_orignal")]
+
+def _read_digest(orig):
+    if orig.endswith("_orignal"):
+        try:
+            with open(_digest_path(orig), 'r') as file:
+                return file.read().strip()
+        except OSError:
+            pass
+    return file_digest(orig)
+
+def original_digest(id):
+    orig = "%s_orignal" % os.path.join(FONT_ROOT, id)
+    if not os.path.exists(orig):
+        raise FontieException(404, "font original does not exist")
+    return _read_digest(orig)
 
 class FontieFont:
-    def __init__(self, file=None, id=None):
+    def __init__(self, file=None, id=None, workspace=None, source=None):
         self._font = None
         self._properties = None
         self._original = None
+        self._pristine = False
+        self._digest = None
         self._tmppath = {}
+        # NOTE A font opened without the workspace of a job gets a workspace
+        #      of its own, which is removed again when the font is closed
+        self._workspace = workspace
+        self._owned = False
+        self._external = False
+        self._version = 0
+        self.generated = 0
+        self.reused = 0
         self.id = None
         self.path = None
         self.orig = None
         self.cssname = None
+        # NOTE The copies split off the font by script and the name and the
+        #      requested unicodes of the shard if the font itself is such a copy
+        self.shards = []
+        self.shard = None
+        self.unicodes = None
         if file != None:
             self.create(file)
         elif id != None:
             self.open(id)
+        elif source != None:
+            self.load(source)
         else:
-            raise Exception("FontieFont constructor requires either file or id");
+            raise Exception("FontieFont constructor requires either file, id or source");
 
     @property
     def font(self):
         try:
             if self._font == None:
-                self._font = fontforge.open(self.path)
+                # NOTE A freshly uploaded font has no working copy yet, but it
+                #      can be read from its original
+                self._font = fontforge.open(self.path if self.path else self.orig)
+                if self._pristine and self._original == None:
+                    self._original = self._names(self._font)
+                self._pristine = False
             return self._font
         except Exception as e:
             raise FontieException(400, "unable to open font", e)
 
+    # NOTE The values are read from the OS/2 table and the encoding of the
+    #      font, like fontforge does when it writes the header of an SVG font
     @property
     def properties(self):
         if self._properties == None:
-            tmppath = self._get_tmppath("svg")
-            with open(tmppath, 'r') as svgfile:
-                svghead = svgfile.read(1024)
-            stylematch = re.compile('font-style="([^"]+)"').search(svghead)
-            stretchmatch = re.compile('font-stretch="([^"]+)"').search(svghead)
-            weightmatch = re.compile('font-weight="([^"]+)"').search(svghead)
-            rangematch = re.compile('unicode-range="([^"]+)"').search(svghead)
+            if self.font.italicangle != 0 or self.font.macstyle & 0x02 or self.font.os2_stylemap & 0x01:
+                style = 'italic'
+            elif "oblique" in self.font.fontname.lower():
+                style = 'oblique'
+            else:
+                style = 'normal'
+            unicodes = FontieRange.from_codepoints(self.codepoints())
             self._properties = {
-                'style': stylematch.group(1) if stylematch else 'normal',
-                'stretch': stretchmatch.group(1) if stretchmatch else 'normal',
-                'weight': weightmatch.group(1) if weightmatch else 'normal',
-                'range': rangematch.group(1) if rangematch else 'U+0-10FFFF'
+                'style': style,
+                'stretch': STRETCHES.get(self.font.os2_width, 'normal'),
+                'weight': str(self.font.os2_weight) if self.font.os2_weight else 'normal',
+                'range': str(unicodes) if unicodes else 'U+0-10FFFF'
             }
         return self._properties
- 
+
     @property
     def original(self):
-        if self._properties == None:
+        if self._original == None:
             font = fontforge.open(self.orig)
-            self._original = {
-                'fontname': font.fontname,
-                'fullname': font.fullname,
-                'familyname': font.familyname
-            }
+            self._original = self._names(font)
             font.close()
         return self._original
 
+    @property
+    def digest(self):
+        if self._digest == None:
+            self._digest = _read_digest(self.orig)
+        return self._digest
+
+    def _names(self, font):
+        return {
+            'fontname': font.fontname,
+            'fullname': font.fullname,
+            'familyname': font.familyname
+        }
+
     def _close_font(self, strict=True):
         if self._font != None:
             try:
@@ -83,134 +213,294 @@ class FontieFont:
 
     def _has_letter_o(self):
         try:
-            font[0x6f]
+            self.font[0x6f]
             return True
         except:
             return False
 
+    # NOTE Intermediates are generated at most once per version of the font,
+    #      the version is only increased if a method really changed the font
     def _get_tmppath(self, format):
-        if not format in self._tmppath:
-            tmppath = "%s.%s" % (self.path, format)
+        if format in self._tmppath and self._tmppath[format][0] == self._version:
+            self.reused += 1
+            return self._tmppath[format][1]
+        tmppath = "%s.%s" % (self.path, format)
+        start = time.time()
+        with self._workspace.track(tmppath):
             if (format == "sfd"):
                 self.font.save(tmppath)
             else:
                 self.font.generate(tmppath)
-            self._tmppath[format] = tmppath
-        return self._tmppath[format]
+        METRICS_STORE.time("fontie_tool_duration_seconds", {'tool': "fontforge"}, start)
+        self.generated += 1
+        self._tmppath[format] = (self._version, tmppath)
+        self._workspace.check()
+        return tmppath
+
+    def _set_tmppath(self, format, src):
+        tmppath = "%s.%s" % (self.path, format)
+        with self._workspace.track(tmppath):
+            shutil.copyfile(src, tmppath)
+        self._tmppath[format] = (self._version, tmppath)
+        self._workspace.check()
+
+    def _changed(self):
+        self._version += 1
+        self._properties = None
 
     def _clear_tmppath(self, strict=True):
         for format in list(self._tmppath):
             try:
-                os.remove(self._tmppath[format])
+                with self._workspace.track(self._tmppath[format][1]):
+                    os.remove(self._tmppath[format][1])
                 del self._tmppath[format]
             except:
                 if strict: raise
                 traceback.print_exc()
 
+    # NOTE The file is streamed straight to the original and hashed on the
+    #      way, the working copy is only created when the font is opened
     def create(self, file):
         id = "%s%s" % (FONT_PREFIX, uuid.uuid4())
         path = os.path.join(FONT_ROOT, id)
         orig = "%s_orignal" % path
-        try:
-            with open(path, 'wb', 1024) as f:
-                chunk = file.read(1024)
-                while chunk:
-                    f.write(chunk)
-                    chunk = file.read(1024)
-        except Exception as e:
-            raise FontieException(413, "unable to write font", e)
-        shutil.copy(path, orig)
+        digest = hashlib.sha256()
+        check_quota()
+        with track(orig, _digest_path(orig)):
+            try:
+                with open(orig, 'wb') as f:
+                    chunk = file.read(CHUNK_SIZE)
+                    while chunk:
+                        digest.update(chunk)
+                        f.write(chunk)
+                        chunk = file.read(CHUNK_SIZE)
+                with open(_digest_path(orig), 'w') as f:
+                    f.write(digest.hexdigest())
+            except Exception as e:
+                for p in [orig, _digest_path(orig)]:
+                    if os.path.exists(p):
+                        os.remove(p)
+                if isinstance(e, FontieException):
+                    raise
+                raise FontieException(413, "unable to write font", e)
+        self.id = id
+        self.orig = orig
+        self._digest = digest.hexdigest()
+        self._pristine = True
+
+    def _open(self, id, orig):
+        if self._workspace == None:
+            self._workspace = FontieWorkspace()
+            self._owned = True
+        path = os.path.join(self._workspace.path, id)
+        with self._workspace.track(path):
+            shutil.copy(orig, path)
         self.id = id
         self.path = path
         self.orig = orig
+        self._pristine = True
+        self._clear_tmppath()
 
     def open(self, id):
-        path = os.path.join(FONT_ROOT, id)
-        orig = "%s_orignal" % path
+        orig = "%s_orignal" % os.path.join(FONT_ROOT, id)
         if not os.path.exists(orig):
             raise FontieException(404, "font original does not exist")
-        shutil.copy(orig, path)
-        self.id = id
-        self.path = path
-        self.orig = orig
+        self._open(id, orig)
+        # NOTE The mtime of the original tells the janitor when it was used
+        os.utime(orig)
+
+    # NOTE Uses a font file outside of fontie as original, e.g. for a batch
+    #      conversion, without copying it to the originals first. The file is
+    #      never removed by destroy.
+    def load(self, source):
+        if not os.path.isfile(source):
+            raise FontieException(404, "font file does not exist")
+        self._open("%s%s" % (FONT_PREFIX, uuid.uuid4()), source)
+        self._external = True
+
+    # NOTE Writes the current state of the font to the given directory. The
+    #      TTF intermediate is kept as well if it is still up to date, since
+    #      the TTF written by ttfautohint cannot be generated again.
+    def checkpoint(self, path):
+        os.makedirs(path)
+        if self._font != None:
+            self._font.save(os.path.join(path, "font"))
+        else:
+            shutil.copyfile(self.path, os.path.join(path, "font"))
+        if "ttf" in self._tmppath and self._tmppath["ttf"][0] == self._version:
+            shutil.copyfile(self._tmppath["ttf"][1], os.path.join(path, "ttf"))
+
+    # NOTE Replaces the working copy by a checkpoint, the original names are
+    #      still read from the original
+    def restore(self, path):
+        self._close_font()
         self._clear_tmppath()
+        with self._workspace.track(self.path):
+            shutil.copyfile(os.path.join(path, "font"), self.path)
+        self._pristine = False
+        self._changed()
+        if os.path.exists(os.path.join(path, "ttf")):
+            self._set_tmppath("ttf", os.path.join(path, "ttf"))
+        self._workspace.check()
+
+    # NOTE Returns a working copy of the current state of the font, which
+    #      shares the workspace and the original names of the font
+    def copy(self, shard=None, unicodes=None):
+        self.save()
+        font = FontieFont(source=self.path, workspace=self._workspace)
+        font._original = self.original
+        font.shard = shard
+        font.unicodes = unicodes
+        return font
 
     def close(self, strict=True):
+        while len(self.shards):
+            self.shards.pop().close(strict)
         self._close_font(strict)
         self._clear_tmppath(strict)
         self._properties = None
         if self.path:
             try:
-                os.remove(self.path)
+                with self._workspace.track(self.path):
+                    os.remove(self.path)
             except:
                 if strict: raise
                 traceback.print_exc()
             self.path = None
+        if self._owned:
+            self._workspace.destroy(strict)
+            self._workspace = None
+            self._owned = False
+
+    # NOTE Writes the current state of the font to its working copy, so it can
+    #      be reopened by another process
+    def save(self):
+        self._pristine = False
+        if self._font != None:
+            with self._workspace.track(self.path):
+                self._font.save(self.path)
+            self._close_font()
+            self._workspace.check()
+        self._clear_tmppath()
+        self._properties = None
 
     def destroy(self, strict=True):
         self.close(strict)
-        if self.orig:
+        if self.orig and not self._external:
             try:
-                os.remove(self.orig)
+                with track(self.orig, _digest_path(self.orig)):
+                    os.remove(self.orig)
+                    if os.path.exists(_digest_path(self.orig)):
+                        os.remove(_digest_path(self.orig))
             except:
                 if strict: raise
                 traceback.print_exc()
             self.orig = None
 
+    def _codepoints(self, glyph):
+        codepoints = []
+        if glyph.unicode >= 0:
+            codepoints.append(glyph.unicode)
+        if glyph.altuni:
+            codepoints += [altuni[0] for altuni in glyph.altuni]
+        return codepoints
+
+    def codepoints(self):
+        codepoints = []
+        for glyph in self.font.glyphs():
+            if glyph.isWorthOutputting():
+                codepoints += self._codepoints(glyph)
+        return codepoints
+
+    # NOTE Returns the names of the glyphs that are kept when subsetting to
+    #      the given ranges
+    def retained(self, ranges):
+        unicodes = FontieRange.parse(ranges)
+        names = set()
+        pending = []
+        for glyph in self.font.glyphs():
+            if any(u in unicodes for u in self._codepoints(glyph)) and glyph.isWorthOutputting():
+                pending.append(glyph.glyphname)
+        # NOTE Keep all glyphs that are referenced by the retained glyphs, even
+        #      if they are referenced only indirectly
+        while pending:
+            name = pending.pop()
+            if name in names or not name in self.font:
+                continue
+            names.add(name)
+            pending += [r[0] for r in self.font[name].references]
+        return names
+
+    # NOTE Tells whether the references of the given glyphs are kept as they
+    #      are when correcting directions or generating a TTF, i.e. none of
+    #      them is flipped, exceeds the scale of TrueType or is mixed with
+    #      contours in the same glyph
+    def plain_references(self, names):
+        for name in names:
+            glyph = self.font[name]
+            if not glyph.references:
+                continue
+            if len(glyph.foreground):
+                return False
+            for reference in glyph.references:
+                xx, xy, yx, yy = reference[1][:4]
+                if xx * yy - xy * yx < 0 or max(abs(xx), abs(xy), abs(yx), abs(yy)) >= 2:
+                    return False
+        return True
+
     def subset(self, ranges):
-        unicodes = []
-        for r in ranges:
-            m = re.compile('([\dABCDEF]+)(?:-([\dABCDEF]+))?').search(r)
-            if m.group(1):
-                if m.group(2):
-                    unicodes += range(int(m.group(1), 16), int(m.group(2), 16)) 
-                else:
-                    unicodes += [int(m.group(1), 16)]
-        for u in unicodes:
-            try:
-                if self.font[u].isWorthOutputting():
-                    self.font.selection.select(('more', 'unicode'), u)
-                    for r in self.font[u].references:
-                        self.font.selection.select(('more',), r[0])
-            except:
-                #print("Selecting glyph u+%04x failed" % u)
-                pass
+        names = self.retained(ranges)
+        if names:
+            self.font.selection.select(*names)
+        else:
+            self.font.selection.none()
         self.font.selection.invert()
+        removed = 0
         for glyph in self.font.selection.byGlyphs:
             glyph.removePosSub("*")
             self.font.removeGlyph(glyph)
+            removed += 1
         self.font.selection.none()
-        self._clear_tmppath()
-        self._properties = None
+        if removed:
+            self._changed()
 
+    # NOTE Drops every lookup entry that references a glyph, which is no
+    #      longer part of the font (e.g. after subsetting)
     def fix_lookups(self):
-        tmppath = self._get_tmppath("sfd")
-        self._close_font()
-        r = os.system("%s \"%s\" \"%s\"" % (FIXLOOKUPS, tmppath, self.path))
-        if r != 0:
-            raise Exception("fixlookups error %d" % r)
-        self._clear_tmppath()
-        #for name in self.font:
-        #   lookups = self.font[name].getPosSub("*")
-        #    self.font[name].removePosSub("*")
-        #    for lookup in lookups:
-        #        valid = True
-        #        if lookup[1] in ["Pair", "Substitution"]:
-        #            print(lookup[2])
-        #        elif lookup[1] in ["Multiple", "Alternate"]:
-        #            print(lookup)
-        #        elif lookup[1] in ["Ligature"]:
-        #            print(lookup)
-        #        else:
-        #            raise Exception("Unknown lookup type")
-        #        if valid:
-        #            print(lookup)
-        #            lookup = list(lookup)
-        #            del lookup[1]
-        #            #self.font[name].addPosSub(*lookup)
-        #            self.font[name].addPosSub("'ss06' Style Set 6 lookup 28 subtable", "ampersant.alt", 2)
+        glyphs = [glyph for glyph in self.font.glyphs() if glyph.isWorthOutputting()]
+        names = set(glyph.glyphname for glyph in glyphs)
+        features_count = 0
+        valid_count = 0
+        invalid_count = 0
+        for glyph in glyphs:
+            features = glyph.getPosSub("*")
+            valid = []
+            for feature in features:
+                if feature[1] == "Position":
+                    checks = ()
+                elif feature[1] == "Pair":
+                    checks = (feature[2],)
+                else:
+                    checks = feature[2:]
+                if all(check in names for check in checks):
+                    valid.append(feature)
+            features_count += len(features)
+            valid_count += len(valid)
+            invalid_count += len(features) - len(valid)
+            # NOTE Glyphs without invalid entries are left untouched
+            if len(valid) < len(features):
+                glyph.removePosSub("*")
+                for feature in valid:
+                    if feature[1] in ["Position", "Pair", "Substitution"]:
+                        glyph.addPosSub(feature[0], *feature[2:])
+                    else:
+                        glyph.addPosSub(feature[0], feature[2:])
+        print("fixlookups: %d glyphs, %d features, %d valid, %d invalid" % (len(glyphs), features_count, valid_count, invalid_count))
+        if invalid_count:
+            self._changed()
 
     def fix_name(self):
+        names = self._names(self.font)
         fullname_match = re.compile("^(%s)\\W?(.*)" % self.font.familyname).search(self.font.fullname)
         fontname_match = re.compile("^(\w)+(?:-(\S+))?$").search(self.font.fontname)
         if fullname_match:
@@ -243,6 +533,8 @@ class FontieFont:
         self.font.fontname = font
         self.font.fullname = full
         self.font.familyname = family
+        if self._names(self.font) != names:
+            self._changed()
 
     def fix_glyphs(self):
         # NOTE Working fix orders: RDOEr, RDOemr, RDOEem
@@ -256,16 +548,17 @@ class FontieFont:
         #self.font.canonicalContours()
         #self.font.canonicalStart()
         #self.font.simplify() # might fix or change a glyp, does not work with canonicalStart/Contours
-        self._clear_tmppath()
+        self._changed()
         self.font.selection.none()
 
     def fix_references(self):
         self.font.selection.all()
         self.font.correctReferences()
-        self._clear_tmppath()
+        self._changed()
         self.font.selection.none()
 
     def fix_metrics(self, strategy="microsoft"):
+        metrics = [getattr(self.font, name) for name in METRICS]
         self.font.os2_winascent += self.font.os2_winascent_add
         self.font.os2_windescent += self.font.os2_windescent_add
         self.font.os2_typoascent += self.font.os2_typoascent_add
@@ -306,7 +599,8 @@ class FontieFont:
             self.font.os2_typolinegap = self.font.hhea_linegap
         else:
             raise FontieException(400, "unknown vertical metrics fixing strategy")
-        self._clear_tmppath()
+        if [getattr(self.font, name) for name in METRICS] != metrics:
+            self._changed()
         #print(self.font.fullname)
         #print("em                  %s" % self.font.em)
         #print("hhea_ascent         %s" % self.font.hhea_ascent)
@@ -324,7 +618,8 @@ class FontieFont:
         #print("os2_typodescent_add %s" % self.font.os2_typodescent_add)
         #print("os2_typolinegap     %s" % self.font.os2_typolinegap)
 
-    def hint(self, method):
+    # NOTE The cache can be bypassed, e.g. to time ttfautohint itself
+    def hint(self, method, cache=True):
         ttfautohint = TTFAUTOHINT
         if method == "gdi":
             ttfautohint += " --strong-stem-width=G"
@@ -339,11 +634,107 @@ class FontieFont:
         if not self._has_letter_o():
             ttfautohint += " --symbol"
         tmppath = self._get_tmppath("ttf")
+        if cache:
+            key = HINT_CACHE.key(ttf_digest(tmppath), ttfautohint, ttfautohint_version())
+            cachepath = HINT_CACHE.get(key)
+        else:
+            cachepath = None
         self._close_font()
-        r = os.system("%s \"%s\" \"%s\"" % (ttfautohint, tmppath, self.path))
-        if r != 0:
-            raise Exception("ttfautohint error %d" % r)
-        self._clear_tmppath()
+        with self._workspace.track(self.path):
+            hinted = False
+            if cachepath:
+                try:
+                    shutil.copyfile(cachepath, self.path)
+                    hinted = True
+                except OSError:
+                    # NOTE The entry might have been evicted since it was looked up
+                    traceback.print_exc()
+            if not hinted:
+                start = time.time()
+                r = os.system("%s \"%s\" \"%s\"" % (ttfautohint, tmppath, self.path))
+                METRICS_STORE.time("fontie_tool_duration_seconds", {'tool': "ttfautohint"}, start)
+                if r != 0:
+                    raise Exception("ttfautohint error %d" % r)
+        if cache and not hinted:
+            try:
+                HINT_CACHE.put(key, self.path)
+            except:
+                # NOTE A failing cache must never fail the build itself
+                traceback.print_exc()
+        # NOTE The output of ttfautohint already is the TTF of the new version
+        self._changed()
+        self._set_tmppath("ttf", self.path)
+
+    # NOTE The external encoders only read the intermediate files, so they can
+    #      run concurrently once fontforge has generated those files
+    def _start_woff2(self, outpath):
+        woff2path = "%s.%s" % (self.path, "woff2")
+        tmppath = self._get_tmppath("ttf")
+        process = subprocess.Popen("%s \"%s\"" % (WOFF2, tmppath), shell=True)
+        return ("woff2_compress", process, lambda: shutil.move(woff2path, outpath), time.time())
+
+    def _wait(self, jobs):
+        errors = []
+        for name, process, finish, start in jobs:
+            r = process.wait()
+            METRICS_STORE.time("fontie_tool_duration_seconds", {'tool': name}, start)
+            if r != 0:
+                print("%s error %d" % (name, r))
+                errors.append("%s error %d" % (name, r))
+            elif finish:
+                try:
+                    finish()
+                except Exception as e:
+                    print("%s error %s" % (name, e))
+                    errors.append("%s error %s" % (name, e))
+        if errors:
+            raise Exception(", ".join(errors))
+
+    def _kill(self, jobs):
+        for name, process, finish, start in jobs:
+            if process.poll() == None:
+                process.kill()
+            process.wait()
+
+    # NOTE The exported files are accounted for as a whole, once the last
+    #      encoder has finished
+    def export(self, paths):
+        with self._workspace.track(*paths.values()):
+            self._export(paths)
+
+    def _export(self, paths):
+        jobs = []
+        try:
+            # NOTE Generate every intermediate before the first encoder starts,
+            #      since fontforge must not be used concurrently
+            for format in ["ttf", "otf"]:
+                if format in paths or (format == "ttf" and ("woff" in paths or "woff2" in paths or "eot" in paths)):
+                    self._get_tmppath(format)
+            # NOTE The external encoders run while the native ones are busy
+            if "woff2" in paths and brotli == None:
+                jobs.append(self._start_woff2(paths['woff2']))
+            if "ttf" in paths:
+                self.export_ttf(paths['ttf'])
+            if "otf" in paths:
+                self.export_otf(paths['otf'])
+            if "woff" in paths:
+                self.export_woff(paths['woff'])
+            if "woff2" in paths and brotli != None:
+                self.export_woff2(paths['woff2'])
+            if "eot" in paths:
+                self.export_eot(paths['eot'])
+            if "svg" in paths:
+                self.export_svg(paths['svg'])
+        except:
+            self._kill(jobs)
+            raise
+        self._wait(jobs)
+
+    def _encode(self, outpath, encoder, *args):
+        with open(self._get_tmppath("ttf"), 'rb') as file:
+            data = file.read()
+        with open(outpath, 'wb') as file:
+            file.write(encoder(data, *args))
 
     def export_ttf(self, outpath):
         tmppath = self._get_tmppath("ttf")
@@ -353,26 +744,22 @@ class FontieFont:
         tmppath = self._get_tmppath("otf")
         shutil.copyfile(tmppath, outpath)
 
+    # NOTE The WOFF formats and EOT are encoded from the TTF intermediate, so
+    #      fontforge never has to generate more than that
     def export_woff(self, outpath):
-        tmppath = self._get_tmppath("woff")
-        shutil.copyfile(tmppath, outpath)
+        self._encode(outpath, woff, WOFF_LEVEL)
 
     def export_woff2(self, outpath):
-        woff2path = "%s.%s" % (self.path, "woff2")
-        tmppath = self._get_tmppath("ttf")
-        r = os.system("%s \"%s\"" % (WOFF2, tmppath))
-        if r != 0:
-            raise Exception("woff2 error %d" % r)
-        shutil.move(woff2path, outpath)
+        if brotli != None:
+            self._encode(outpath, woff2, WOFF2_QUALITY)
+        else:
+            self._wait([self._start_woff2(outpath)])
 
     def export_eot(self, outpath):
-        tmppath = self._get_tmppath("ttf")
-        r = os.system("%s \"%s\" \"%s\"" % (EOTFAST, tmppath, outpath))
-        if r != 0:
-            raise Exception("eotfast error %d" % r)
+        self._encode(outpath, eot)
 
+    # NOTE The SVG font is written straight from the outlines, which makes
+    #      both the SVG intermediate and the minification with scour obsolete
     def export_svg(self, outpath):
-        tmppath = self._get_tmppath("svg")
-        r = os.system("%s -i \"%s\" -o \"%s\"" % (SCOUR, tmppath, outpath))
-        if r != 0:
-            raise Exception("scour error %d" % r)
+        with open(outpath, 'w', encoding="utf-8") as file:
+            svg(self.font, self.properties, file)
@@ -0,0 +1,194 @@
+import os
+import time
+import shutil
+import signal
+import traceback
+
+from FontieCache import path_size, count_stats, read_stats
+from FontieWorkspace import reconcile, in_use, usage, WORKSPACE_QUOTA, FONT_ROOT, FONT_PREFIX, PACKAGE_ROOT, PACKAGE_PREFIX, WORKSPACE_ROOT, WORKSPACE_PREFIX
+from FontiePackage import PACKAGE_NAME
+from FontieJob import FontieJob, JOB_ROOT, JOB_PREFIX, STATUS_NAME
+
+JANITOR_ROOT = os.environ.get("FONTIE_JANITOR_ROOT", "/tmp/fontie-janitor")
+JANITOR_INTERVAL = 60
+# NOTE Idle times after which an entry is removed, counted from its last access
+JANITOR_FONT_TTL = 24*60*60
+JANITOR_PACKAGE_TTL = 60*60
+JANITOR_WORKSPACE_TTL = 60*60
+JANITOR_JOB_TTL = 24*60*60
+# NOTE Every entry is removed at this age, no matter how often it is accessed
+JANITOR_MAX_AGE = 7*24*60*60
+# NOTE Budget for the originals, packages and workspaces together. Entries
+#      accessed within the grace period are never removed for the budget, so
+#      builds that are still running keep their files.
+JANITOR_MAX_SIZE = int(os.environ.get("FONTIE_JANITOR_MAX_SIZE", 6*1024*1024*1024))
+JANITOR_GRACE = 5*60
+
+STATS_NAME = ".stats"
+
+def _mtime(path, default=None):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return default
+
+def _scan(root, prefix):
+    try:
+        return [entry for entry in os.scandir(root) if entry.name.startswith(prefix)]
+    except FileNotFoundError:
+        return []
+
+# INFO Removes abandoned originals, packages, workspaces and jobs
+#
+#      Nothing is removed by the requests themselves unless a client asks for
+#      it, so the janitor runs in a process of its own next to the workers.
+#      The creation and last-access times are taken from the files:
+#
+#      - The mtime of the digest of an original is its creation time, the
+#        mtime of the original itself is updated whenever it is opened.
+#      - The mtime of a package directory is its creation time, the mtime of
+#        the contained package is updated whenever it is opened.
+#      - Workspaces and jobs are idle as long as nothing is written to them,
+#        but workspaces and packages are never removed while they are locked
+#        by the build that uses them.
+#
+#      The janitor is also the only one that walks the stores to reconcile
+#      the usage counter that is checked against the quota.
+class FontieJanitor:
+    def __init__(self, interval=JANITOR_INTERVAL):
+        self.interval = interval
+        self.stopping = False
+
+    def _count(self, **increments):
+        count_stats(os.path.join(JANITOR_ROOT, STATS_NAME), **increments)
+
+    # NOTE Every entry is a tuple of the last access, the creation time, the
+    #      size, the TTL and the paths that belong to the entry
+    def _entries(self):
+        entries = []
+        for entry in _scan(FONT_ROOT, FONT_PREFIX):
+            if entry.name.endswith("_orignal"):
+                orig = entry.path
+                digest = "%s_digest" % orig[:-len("_orignal")]
+                accessed = _mtime(orig)
+                created = _mtime(digest, accessed)
+                paths = [orig, digest]
+            elif entry.name.endswith("_digest"):
+                # NOTE A digest is only removed on its own if its original is gone
+                if os.path.exists("%s_orignal" % entry.path[:-len("_digest")]):
+                    continue
+                accessed = created = _mtime(entry.path)
+                paths = [entry.path]
+            else:
+                continue
+            if accessed != None:
+                entries.append((accessed, created, JANITOR_FONT_TTL, paths))
+        for entry in _scan(PACKAGE_ROOT, PACKAGE_PREFIX):
+            created = _mtime(entry.path)
+            accessed = max(created or 0, _mtime(os.path.join(entry.path, PACKAGE_NAME), 0))
+            if created != None:
+                entries.append((accessed, created, JANITOR_PACKAGE_TTL, [entry.path]))
+        for entry in _scan(WORKSPACE_ROOT, WORKSPACE_PREFIX):
+            accessed = _mtime(entry.path)
+            if accessed != None:
+                entries.append((accessed, accessed, JANITOR_WORKSPACE_TTL, [entry.path]))
+        result = []
+        for accessed, created, ttl, paths in entries:
+            try:
+                size = sum(path_size(path) for path in paths if os.path.exists(path))
+            except OSError:
+                continue
+            result.append((accessed, created, size, ttl, paths))
+        result.sort()
+        return result
+
+    def _remove(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def _clean_jobs(self, now):
+        evictions = 0
+        reclaimed = 0
+        for entry in _scan(JOB_ROOT, JOB_PREFIX):
+            accessed = _mtime(os.path.join(entry.path, STATUS_NAME), _mtime(entry.path))
+            if accessed == None or now - accessed <= JANITOR_JOB_TTL:
+                continue
+            try:
+                if FontieJob(entry.name).status()['status'] in ["queued", "running"]:
+                    continue
+            except Exception:
+                pass
+            try:
+                size = path_size(entry.path)
+                shutil.rmtree(entry.path)
+                evictions += 1
+                reclaimed += size
+            except OSError:
+                traceback.print_exc()
+        return evictions, reclaimed
+
+    def clean(self):
+        now = time.time()
+        evictions, reclaimed = self._clean_jobs(now)
+        entries = self._entries()
+        total = sum(entry[2] for entry in entries)
+        for accessed, created, size, ttl, paths in entries:
+            if now - accessed > ttl or now - created > JANITOR_MAX_AGE:
+                pass
+            elif JANITOR_MAX_SIZE and total > JANITOR_MAX_SIZE and now - accessed > JANITOR_GRACE:
+                pass
+            else:
+                continue
+            # NOTE The workspaces and packages of running builds are locked
+            if any(in_use(path) for path in paths):
+                continue
+            try:
+                self._remove(paths)
+                evictions += 1
+                reclaimed += size
+                total -= size
+            except OSError:
+                traceback.print_exc()
+        self._count(runs=1, evictions=evictions, reclaimed=reclaimed)
+        # NOTE The entries left by this run are kept for the stats, so they
+        #      never have to walk the stores themselves
+        self._count(reset=True, last_run=now, last_evictions=evictions, last_reclaimed=reclaimed, entries=len(entries) - evictions, size=total)
+        # NOTE The removals above are not tracked by the usage counter, which
+        #      is corrected by a full walk once per run
+        reconcile()
+        if evictions:
+            print("Janitor: %d entries removed, %d bytes reclaimed" % (evictions, reclaimed))
+
+    # NOTE The entries and their size are those left by the last run, the
+    #      current usage is read from the running counter of the stores
+    def stats(self):
+        stats = read_stats(os.path.join(JANITOR_ROOT, STATS_NAME))
+        result = {
+            'runs': stats.get('runs', 0),
+            'evictions': stats.get('evictions', 0),
+            'reclaimed': stats.get('reclaimed', 0),
+            'last_run': stats.get('last_run'),
+            'last_evictions': stats.get('last_evictions', 0),
+            'last_reclaimed': stats.get('last_reclaimed', 0),
+            'entries': stats.get('entries', 0),
+            'size': stats.get('size', 0),
+            'usage': usage(),
+            'quota': WORKSPACE_QUOTA,
+            'max_size': JANITOR_MAX_SIZE,
+            'max_age': JANITOR_MAX_AGE
+        }
+        return result
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'stopping', True))
+        while not self.stopping:
+            try:
+                self.clean()
+            except:
+                traceback.print_exc()
+            deadline = time.time() + self.interval
+            while not self.stopping and time.time() < deadline:
+                time.sleep(1)
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import traceback
+
+from FontieException import FontieException
+from FontieFont import original_digest
+from FontiePackage import FontiePackage, options_key, PACKAGE_ROOT
+from FontieMetrics import METRICS_STORE
+
+JOB_ROOT = os.environ.get("FONTIE_JOB_ROOT", "/tmp/fontie-jobs")
+JOB_PREFIX = "job_"
+# NOTE Maximum number of package builds that run at the same time, all
+#      further jobs stay queued until a slot is free
+JOB_SLOTS = 2
+JOB_POLL = 0.5
+
+STATUS_NAME = "status.json"
+LOG_NAME = "log"
+LOCK_NAME = ".lock"
+SLOT_NAME = ".slot-%d"
+
+# INFO Package build running in the background
+#
+#      The id of a job is derived from the original fonts and the options of
+#      the build, so submitting the same build twice attaches to the job that
+#      is already queued or running. The status of a job is kept on disk,
+#      since it is read and written by different processes.
+class FontieJob:
+    def __init__(self, id):
+        if not id.startswith(JOB_PREFIX) or os.sep in id:
+            raise FontieException(400, "invalid job id")
+        self.id = id
+        self.path = os.path.join(JOB_ROOT, id)
+
+    @classmethod
+    def submit(cls, options, detach=None):
+        digests = [original_digest(font) for font in options['font']]
+        job = cls("%s%s" % (JOB_PREFIX, options_key(digests, options)))
+        os.makedirs(JOB_ROOT, exist_ok=True)
+        with open(os.path.join(JOB_ROOT, LOCK_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(job.path):
+                if job._active():
+                    print("Job: attached to %s" % job.id)
+                    return job
+                shutil.rmtree(job.path)
+            os.makedirs(job.path)
+            now = time.time()
+            job._write({
+                'job': job.id,
+                'status': "queued",
+                'stage': None,
+                'package': None,
+                'message': None,
+                'pid': os.getpid(),
+                'created': now,
+                'updated': now
+            })
+        job._start(options, detach)
+        return job
+
+    @classmethod
+    def counts(cls):
+        counts = {}
+        if not os.path.isdir(JOB_ROOT):
+            return counts
+        for name in os.listdir(JOB_ROOT):
+            if not name.startswith(JOB_PREFIX):
+                continue
+            try:
+                status = cls(name).status()['status']
+            except FontieException:
+                continue
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def _read(self):
+        try:
+            with open(os.path.join(self.path, STATUS_NAME), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            raise FontieException(404, "job does not exist", e)
+
+    def _write(self, status):
+        tmppath = os.path.join(self.path, "%s.%s" % (STATUS_NAME, uuid.uuid4()))
+        with open(tmppath, 'w') as file:
+            json.dump(status, file)
+        os.rename(tmppath, os.path.join(self.path, STATUS_NAME))
+
+    def _update(self, **values):
+        status = self._read()
+        status.update(values)
+        status['updated'] = time.time()
+        self._write(status)
+
+    def _alive(self, pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+
+    def _active(self):
+        try:
+            status = self.status()
+        except FontieException:
+            return False
+        if status['status'] in ["queued", "running"]:
+            return True
+        if status['status'] == "done":
+            return os.path.exists(os.path.join(PACKAGE_ROOT, status['package']))
+        return False
+
+    def _acquire(self):
+        while True:
+            for i in range(JOB_SLOTS):
+                slot = open(os.path.join(JOB_ROOT, SLOT_NAME % i), 'a')
+                try:
+                    fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return slot
+                except OSError:
+                    slot.close()
+            time.sleep(JOB_POLL)
+
+    def _start(self, options, detach):
+        # NOTE Double fork, so the build neither has to be reaped by the
+        #      request handler nor dies with it
+        pid = os.fork()
+        if pid > 0:
+            os.waitpid(pid, 0)
+            return
+        code = 0
+        try:
+            os.setsid()
+            if os.fork() > 0:
+                os._exit(0)
+            if detach:
+                detach()
+            self._run(options)
+        except:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _run(self, options):
+        with open(os.path.join(self.path, LOG_NAME), 'w') as log:
+            os.dup2(log.fileno(), sys.stdout.fileno())
+            os.dup2(log.fileno(), sys.stderr.fileno())
+        self._update(pid=os.getpid())
+        slot = self._acquire()
+        try:
+            self._update(status="running")
+            package = FontiePackage()
+            package.listener = lambda stage: self._update(stage=stage)
+            try:
+                package.make(options)
+                self._update(status="done", stage=None, package=package.id)
+            except FontieException as e:
+                if e.original_exception:
+                    print("Exception: %s" % e.original_exception)
+                print("Message: %s" % e.message)
+                package.destroy(False)
+                self._update(status="failed", message=e.message)
+            except:
+                traceback.print_exc()
+                package.destroy(False)
+                self._update(status="failed", message="internal error")
+        finally:
+            slot.close()
+            METRICS_STORE.flush()
+
+    def status(self):
+        status = self._read()
+        if status['status'] in ["queued", "running"] and not self._alive(status['pid']):
+            status['status'] = "failed"
+            status['message'] = "job terminated unexpectedly"
+        del status['pid']
+        return status
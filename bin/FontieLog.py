@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import random
+import signal
+import struct
+import traceback
+
+LOG_SIZE = 256*1024
+# NOTE Share of the successful requests that are logged anyway
+LOG_SAMPLE = float(os.environ.get("FONTIE_LOG_SAMPLE", 0.01))
+
+CHUNK_SIZE = 65536
+MARK_BEGIN = b"\0fontie-log-begin\0"
+MARK_END = b"\0fontie-log-end\0"
+RESULT_HEADER = ">QQ"
+
+def _read_exactly(fd, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            raise EOFError("log drain has exited")
+        data += chunk
+    return bytes(data)
+
+# INFO Bounded in-memory capture of the output of a request
+#
+#      The stdout and stderr descriptors of the process are redirected to a
+#      pipe once, so the output of fontforge and of the external tools is
+#      captured as well. The pipe is drained by a forked child process, since
+#      a thread of the same interpreter can not run while fontforge blocks on
+#      a full pipe without releasing the GIL. The child keeps the last bytes
+#      of the current request in a buffer of fixed size and passes everything
+#      written outside of a request through. The begin and end of a request
+#      are marked in-band, so the child sees them in order with the output.
+#      At the end of a request it hands the captured output back through a
+#      second pipe, which is written as a single JSON line, but only if the
+#      request failed or was sampled.
+class FontieLog:
+    def __init__(self, size=LOG_SIZE, sample=LOG_SAMPLE):
+        self.size = size
+        self.sample = sample
+        self._pid = None
+
+    def _start(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self._out = os.dup(sys.stdout.fileno())
+        read, write = os.pipe()
+        results, result = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(write)
+                os.close(results)
+                # NOTE The child must not keep the sockets of the worker open
+                keep = sorted([read, result, self._out])
+                os.closerange(3, keep[0])
+                os.closerange(keep[0] + 1, keep[1])
+                os.closerange(keep[1] + 1, keep[2])
+                os.closerange(keep[2] + 1, os.sysconf("SC_OPEN_MAX"))
+                # NOTE The child exits once every writer has closed the pipe
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)
+                self._drain(read, result)
+            except:
+                traceback.print_exc()
+            finally:
+                os._exit(0)
+        os.close(read)
+        os.close(result)
+        os.dup2(write, sys.stdout.fileno())
+        os.dup2(write, sys.stderr.fileno())
+        os.close(write)
+        self._results = results
+        self._pid = os.getpid()
+
+    def _append(self, data):
+        if not self._capturing:
+            os.write(self._out, data)
+            return
+        self._buffer += data
+        if len(self._buffer) > self.size:
+            self._dropped += len(self._buffer) - self.size
+            del self._buffer[:len(self._buffer) - self.size]
+
+    def _mark(self, mark, result):
+        if mark == MARK_BEGIN:
+            self._capturing = True
+        else:
+            output = bytes(self._buffer)
+            os.write(result, struct.pack(RESULT_HEADER, len(output), self._dropped) + output)
+            self._capturing = False
+        self._buffer = bytearray()
+        self._dropped = 0
+
+    # NOTE Runs in the child until the pipe is closed
+    def _drain(self, read, result):
+        self._buffer = bytearray()
+        self._dropped = 0
+        self._capturing = False
+        pending = b""
+        while True:
+            data = os.read(read, CHUNK_SIZE)
+            if not data:
+                break
+            data = pending + data
+            pending = b""
+            while True:
+                marks = [(data.find(mark), mark) for mark in [MARK_BEGIN, MARK_END] if mark in data]
+                if not marks:
+                    break
+                i, mark = min(marks)
+                self._append(data[:i])
+                self._mark(mark, result)
+                data = data[i + len(mark):]
+            # NOTE A mark might have been split between two reads
+            for n in range(max(len(MARK_BEGIN), len(MARK_END)) - 1, 0, -1):
+                if data.endswith(MARK_BEGIN[:n]) or data.endswith(MARK_END[:n]):
+                    pending = data[-n:]
+                    data = data[:-n]
+                    break
+            self._append(data)
+
+    def _write_mark(self, mark):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.write(sys.stdout.fileno(), mark)
+
+    def begin(self):
+        if self._pid != os.getpid():
+            self._start()
+        # NOTE The output written before the request is passed through
+        self._write_mark(MARK_BEGIN)
+
+    def end(self, record, error=False):
+        self._write_mark(MARK_END)
+        try:
+            length, dropped = struct.unpack(RESULT_HEADER, _read_exactly(self._results, struct.calcsize(RESULT_HEADER)))
+            output = _read_exactly(self._results, length)
+        except EOFError:
+            # NOTE The output is lost if the drain has died, e.g. by a signal
+            output = b""
+            dropped = 0
+        if error or random.random() < self.sample:
+            record['time'] = time.time()
+            record['pid'] = os.getpid()
+            record['error'] = error
+            record['dropped'] = dropped
+            record['output'] = output.decode("utf-8", "replace")
+            os.write(self._out, (json.dumps(record) + "\n").encode("utf-8"))
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+
+from FontieCache import count_stats, read_stats
+
+METRICS_ROOT = os.environ.get("FONTIE_METRICS_ROOT", "/tmp/fontie-metrics")
+METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+STATS_NAME = ".stats"
+BUSY_PREFIX = "busy-"
+
+# NOTE Type and help text of every metric, the samples of metrics that are
+#      not listed here are not exported
+METRICS = {
+    'fontie_requests_total': ("counter", "Handled HTTP requests"),
+    'fontie_request_duration_seconds': ("histogram", "Duration of HTTP requests"),
+    'fontie_stage_duration_seconds': ("histogram", "Duration of package build stages"),
+    'fontie_tool_duration_seconds': ("histogram", "Duration of external tool calls"),
+    'fontie_workers_busy': ("gauge", "Workers that are handling a request"),
+    'fontie_requests_queued': ("gauge", "Connections waiting to be accepted"),
+    'fontie_jobs': ("gauge", "Background jobs by status"),
+    'fontie_storage_bytes': ("gauge", "Bytes used by originals, packages and workspaces"),
+    'fontie_workspace_free_bytes': ("gauge", "Free bytes on the filesystem of the workspaces")
+}
+
+def _sample(name, labels):
+    if not labels:
+        return name
+    return "%s{%s}" % (name, ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in sorted(labels.items())))
+
+# NOTE The buckets of a histogram have to be rendered in increasing order
+def _order(key):
+    match = re.search(',?le="([^"]*)"', key)
+    if not match:
+        return (key, 0)
+    return (key[:match.start()] + key[match.end():], float(match.group(1)))
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+# NOTE For a listening socket the receive queue in /proc/net/tcp is the
+#      number of connections that have not been accepted yet
+def listen_backlog(port):
+    backlog = 0
+    for name in ["/proc/net/tcp", "/proc/net/tcp6"]:
+        try:
+            with open(name, 'r') as file:
+                lines = file.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                backlog += int(fields[4].split(":")[1], 16)
+    return backlog
+
+# INFO Prometheus metrics shared by all processes
+#
+#      The counters and histograms of all processes are summed up in a locked
+#      stats file, using the name and labels of a sample as key. A process
+#      collects its samples in memory and adds them to the file in a single
+#      step once its current request or job is done. Gauges are computed when
+#      the metrics are rendered.
+class FontieMetrics:
+    def __init__(self, root):
+        self.root = root
+        self._pid = None
+        self._samples = {}
+
+    # NOTE A forked process must not add the samples of its parent again
+    @property
+    def samples(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._samples = {}
+        return self._samples
+
+    def inc(self, name, labels=None, value=1):
+        key = _sample(name, labels)
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        labels = dict(labels or {})
+        for bucket in METRICS_BUCKETS:
+            labels['le'] = "%g" % bucket
+            self.inc("%s_bucket" % name, labels, 1 if value <= bucket else 0)
+        labels['le'] = "+Inf"
+        self.inc("%s_bucket" % name, labels)
+        del labels['le']
+        self.inc("%s_sum" % name, labels, value)
+        self.inc("%s_count" % name, labels)
+
+    def time(self, name, labels, start):
+        self.observe(name, labels, time.time() - start)
+
+    def flush(self):
+        if self.samples:
+            count_stats(os.path.join(self.root, STATS_NAME), **self.samples)
+            self._samples = {}
+
+    def busy(self, busy):
+        path = os.path.join(self.root, "%s%d" % (BUSY_PREFIX, os.getpid()))
+        if busy:
+            os.makedirs(self.root, exist_ok=True)
+            open(path, 'w').close()
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def workers_busy(self):
+        count = 0
+        if not os.path.isdir(self.root):
+            return count
+        for name in os.listdir(self.root):
+            if not name.startswith(BUSY_PREFIX):
+                continue
+            if _alive(int(name[len(BUSY_PREFIX):])):
+                count += 1
+            else:
+                # NOTE The worker died while it was handling a request
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+        return count
+
+    def render(self, gauges):
+        stats = read_stats(os.path.join(self.root, STATS_NAME))
+        for name, labels, value in gauges:
+            stats[_sample(name, labels)] = value
+        lines = []
+        for name, (type, help) in sorted(METRICS.items()):
+            samples = sorted((key for key in stats if key.split("{")[0] in [name, "%s_bucket" % name, "%s_sum" % name, "%s_count" % name]), key=_order)
+            if not samples:
+                continue
+            lines.append("# HELP %s %s" % (name, help))
+            lines.append("# TYPE %s %s" % (name, type))
+            for key in samples:
+                lines.append("%s %s" % (key, repr(float(stats[key]))))
+        return "\n".join(lines) + "\n"
+
+METRICS_STORE = FontieMetrics(METRICS_ROOT)
@@ -0,0 +1,116 @@
+import email.parser
+
+from FontieException import FontieException
+
+CHUNK_SIZE = 65536
+HEADER_MAX_SIZE = 16384
+
+class FontieMultipartPart:
+    def __init__(self, multipart, headers):
+        self._multipart = multipart
+        self.name = headers.get_param('name', header='content-disposition')
+        self.filename = headers.get_param('filename', header='content-disposition')
+        self.type = headers.get_content_type()
+
+    def read(self, size=-1):
+        if size < 0:
+            result = []
+            chunk = self._multipart._read(CHUNK_SIZE)
+            while chunk:
+                result.append(chunk)
+                chunk = self._multipart._read(CHUNK_SIZE)
+            return b"".join(result)
+        return self._multipart._read(size)
+
+# INFO Streaming parser for multipart/form-data request bodies
+#
+#      The parts are handed out one after another while the body is read, so
+#      the content of a part can be written to its final destination without
+#      being spooled to memory or to a temporary file first. The body is never
+#      read beyond its Content-Length, which is checked against the given
+#      limit before the first byte is read.
+class FontieMultipart:
+    def __init__(self, rfile, headers, max_size):
+        if headers.get_content_type() != "multipart/form-data":
+            raise FontieException(400, "expecting multipart/form-data")
+        boundary = headers.get_param('boundary')
+        if not boundary:
+            raise FontieException(400, "missing multipart boundary")
+        try:
+            length = int(headers.get('Content-Length'))
+        except (TypeError, ValueError) as e:
+            raise FontieException(411, "missing content length", e)
+        if length > max_size:
+            raise FontieException(413, "request too large")
+        self._rfile = rfile
+        self._remaining = length
+        # NOTE The leading line break lets the first boundary match the same
+        #      delimiter as all following ones
+        self._buffer = b"\r\n"
+        self._delimiter = b"\r\n--" + boundary.encode("latin-1")
+        self._done = False
+
+    def _fill(self):
+        if self._remaining <= 0:
+            return False
+        chunk = self._rfile.read(min(CHUNK_SIZE, self._remaining))
+        if not chunk:
+            raise FontieException(400, "incomplete multipart body")
+        self._remaining -= len(chunk)
+        self._buffer += chunk
+        return True
+
+    def _read(self, size):
+        if self._done:
+            return b""
+        while True:
+            i = self._buffer.find(self._delimiter)
+            if i == 0:
+                self._done = True
+                return b""
+            if i > 0:
+                n = i
+            else:
+                # NOTE Only data in front of a possibly incomplete delimiter
+                #      is known to belong to the part
+                n = len(self._buffer) - len(self._delimiter) + 1
+                if n < size and self._fill():
+                    continue
+                if n <= 0:
+                    raise FontieException(400, "incomplete multipart body")
+            result = self._buffer[:min(n, size)]
+            self._buffer = self._buffer[len(result):]
+            return result
+
+    def _drain(self):
+        while self._read(CHUNK_SIZE):
+            pass
+
+    def parts(self):
+        # NOTE The preamble is treated like the content of a part
+        self._done = False
+        while True:
+            self._drain()
+            while len(self._buffer) < len(self._delimiter) + 4 and self._fill():
+                pass
+            tail = self._buffer[len(self._delimiter):len(self._delimiter) + 2]
+            if tail == b"--":
+                return
+            if tail != b"\r\n":
+                raise FontieException(400, "invalid multipart body")
+            self._buffer = self._buffer[len(self._delimiter) + 2:]
+            i = self._buffer.find(b"\r\n\r\n")
+            while i < 0:
+                if len(self._buffer) > HEADER_MAX_SIZE or not self._fill():
+                    raise FontieException(400, "invalid multipart headers")
+                i = self._buffer.find(b"\r\n\r\n")
+            headers = email.parser.BytesHeaderParser().parsebytes(self._buffer[:i + 2])
+            self._buffer = self._buffer[i + 4:]
+            self._done = False
+            yield FontieMultipartPart(self, headers)
+
+    def fields(self):
+        result = {}
+        for part in self.parts():
+            result.setdefault(part.name, []).append(part.read().decode("utf-8", "replace"))
+        return result
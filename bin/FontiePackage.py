@@ -1,22 +1,54 @@
 import os
+import time
 import shutil
 import uuid
-import io
 import zipfile
 import base64
+import traceback
+import multiprocessing
+import concurrent.futures
+
+import fontforge
 
 from FontieException import FontieException
-from FontieFont import FontieFont
+from FontieFont import FontieFont, ttfautohint_version
+from FontieRange import parse_shards, shard_range
+from FontieCache import FontieCache
+from FontieMetrics import METRICS_STORE
+from FontieWorkspace import FontieWorkspace, check_quota, track, account, hold, PACKAGE_ROOT, PACKAGE_PREFIX, CHECKPOINT_ROOT, CHECKPOINT_PREFIX
 
-PACKAGE_ROOT="/tmp"
-PACKAGE_PREFIX="fontie_"
 PACKAGE_NAME="fontie-package"
 
+# NOTE Number of worker processes used to build the fonts of a family in
+#      parallel, a value of 1 builds them one after another
+PACKAGE_WORKERS=4
+
+CACHE_ROOT=os.environ.get("FONTIE_CACHE_ROOT", "/tmp/fontie-cache")
+CACHE_MAX_SIZE=1024*1024*1024
+CACHE_MAX_AGE=7*24*60*60
+
+# NOTE Part of the cache keys, has to be increased whenever a change of the
+#      pipeline or of the encoders changes the generated files
+PACKAGE_FORMAT_VERSION=1
+
+# NOTE The state of a font is saved after each of these stages, so a build
+#      that only differs in later stages can resume from there
+CHECKPOINT_STAGES=["fix", "hint", "subset"]
+CHECKPOINT_MAX_SIZE=1024*1024*1024
+CHECKPOINT_MAX_AGE=24*60*60
+
+# NOTE Multiple of 3, so the base64 encoded chunks can simply be concatenated
+BASE64_CHUNK_SIZE=3*16384
+
 FONTSMOOTHIE="/opt/fontie/fontsmoothie/fontsmoothie.min.js"
 
-FILE_CSS = """@font-face {
+# NOTE The src of a font face is written in between, so inlined fonts can be
+#      streamed into the file
+FILE_CSS_HEAD = """@font-face {
     font-family:'%s';
-    src: %s;
+    src: """
+
+FILE_CSS_TAIL = """;
     font-weight: %s;
     font-style: %s;
     font-stretch: %s;
@@ -115,51 +147,120 @@ MIMETYPES = {
     'otf': "application/octet-stream"
 }
 
+PACKAGE_CACHE = FontieCache(CACHE_ROOT, CACHE_MAX_SIZE, CACHE_MAX_AGE)
+# NOTE The checkpoints are part of the stores and count against the quota
+CHECKPOINT_CACHE = FontieCache(CHECKPOINT_ROOT, CHECKPOINT_MAX_SIZE, CHECKPOINT_MAX_AGE, account)
+
+# NOTE Identifies a build by the original fonts, the canonicalized options and
+#      the versions of the tools and encoders, which change the result
+def options_key(digests, options):
+    canonical = {}
+    for name, value in options.items():
+        if name == 'font':
+            continue
+        elif isinstance(value, list):
+            canonical[name] = sorted(set(v.strip().upper() if name == 'ranges' else v for v in value))
+        else:
+            canonical[name] = value
+    return PACKAGE_CACHE.key(digests, canonical, fontforge.version(), ttfautohint_version(), PACKAGE_FORMAT_VERSION)
+
+# NOTE Identifies the state of a font after the given stages of a plan, the
+#      versions of the tools are part of it, since they change the result
+def checkpoint_key(digest, plan):
+    canonical = []
+    for stage, argument in plan:
+        if isinstance(argument, list):
+            argument = sorted(set(v.strip().upper() if stage == 'subset' else v for v in argument))
+        canonical.append([stage, argument])
+    key = CHECKPOINT_CACHE.key(digest, canonical, fontforge.version(), ttfautohint_version(), PACKAGE_FORMAT_VERSION)
+    return "%s%s" % (CHECKPOINT_PREFIX, key)
+
+# NOTE Formats a plan for the log, e.g. "fix(name) > subset > fix(glyphs)"
+def describe_plan(plan):
+    steps = []
+    for stage, argument in plan:
+        if stage == "fix" or stage == "shard":
+            steps.append("%s(%s)" % (stage, ",".join(argument)))
+        elif stage == "hint":
+            steps.append("hint(%s)" % argument)
+        else:
+            steps.append(stage)
+    return " > ".join(steps)
+
 class FontiePackage:
-    def __init__(self, id=None):
+    def __init__(self, id=None, path=None):
         self.output = {}
+        self.listener = None
+        self.workspace = None
+        self._current = None
+        self._lock = None
         if not id:
-            self.create()
+            self.create(path)
         else:
             self.open(id)
 
-    def _generate_url(self, type, paths, options):
+    # NOTE The package is handed to the worker processes of a parallel build,
+    #      which neither report to the listener nor continue the current stage
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['listener'] = None
+        state['_current'] = None
+        state['_lock'] = None
+        return state
+
+    # NOTE Ends the current stage and starts the given one, the duration of
+    #      every stage is recorded in the metrics
+    def _stage(self, name):
+        if self._current:
+            METRICS_STORE.time("fontie_stage_duration_seconds", {'stage': self._current[0]}, self._current[1])
+        self._current = (name, time.time()) if name else None
+        if self.listener and name:
+            self.listener(name)
+
+    # NOTE Inlined fonts are base64 encoded chunk by chunk while they are
+    #      read, so a font is never held in memory as a whole
+    def _write_url(self, file, type, paths, options, inlined):
         if 'base64' in options:
-            with open(paths[type], 'rb') as file:
-                data = file.read()
-            os.remove(paths[type])
-            data = base64.b64encode(data).decode("utf-8")
-            url = "data:%s;charset=utf-8;base64,%s" % (MIMETYPES[type], data)
+            file.write("data:%s;charset=utf-8;base64," % MIMETYPES[type])
+            with open(paths[type], 'rb') as font:
+                chunk = font.read(BASE64_CHUNK_SIZE)
+                while chunk:
+                    file.write(base64.b64encode(chunk).decode("ascii"))
+                    chunk = font.read(BASE64_CHUNK_SIZE)
+            inlined.add(paths[type])
         else:
-            url = os.path.relpath(paths[type], self.path)
-        return url
+            file.write(os.path.relpath(paths[type], self.path))
 
-    def _generate_css(self, font, options):
-        paths = self.output[font.font.fullname]
+    def _write_css(self, file, font, paths, range, options, inlined):
         src = []
         if 'local' in options:
-            src.append("local('%s'), local(%s)" % (font.original['fontname'], font.original['fullname']))
+            src.append(("local('%s'), local(%s)" % (font.original['fontname'], font.original['fullname']), None, ""))
         if 'eot' in paths:
-            url = self._generate_url("eot", paths, options)
-            src.append("url('%s?#iefix') format('embedded-opentype')" % url)
-            src[0] = "url('%s');\n\tsrc: %s" % (url, src[0])
+            src.append(("url('", "eot", "?#iefix') format('embedded-opentype')"))
         if 'woff2' in paths:
-            url = self._generate_url("woff2", paths, options)
-            src.append("url('%s') format('woff2')" % url)
+            src.append(("url('", "woff2", "') format('woff2')"))
         if 'woff' in paths:
-            url = self._generate_url("woff", paths, options)
-            src.append("url('%s') format('woff')" % url)
+            src.append(("url('", "woff", "') format('woff')"))
         if 'ttf' in paths:
-            url = self._generate_url("ttf", paths, options)
-            src.append("url('%s') format('truetype')" % url)
+            src.append(("url('", "ttf", "') format('truetype')"))
         if 'otf' in paths:
-            url = self._generate_url("otf", paths, options)
-            src.append("url('%s') format('opentype')" % url)
+            src.append(("url('", "otf", "') format('opentype')"))
         if 'svg' in paths:
-            url = self._generate_url("svg", paths, options)
-            src.append("url('%s#%s') format('svg')" % (url, font.font.fullname))
-        src = ",\n\t\t".join(src)
-        return FILE_CSS % (font.cssname, src, font.properties['weight'], font.properties['style'], font.properties['stretch'], font.properties['range'])
+            src.append(("url('", "svg", "#%s') format('svg')" % font.font.fontname))
+        file.write(FILE_CSS_HEAD % font.cssname)
+        if 'eot' in paths:
+            file.write("url('")
+            self._write_url(file, "eot", paths, options, inlined)
+            file.write("');\n\tsrc: ")
+        for i, entry in enumerate(src):
+            if i > 0:
+                file.write(",\n\t\t")
+            prefix, type, suffix = entry
+            file.write(prefix)
+            if type:
+                self._write_url(file, type, paths, options, inlined)
+            file.write(suffix)
+        file.write(FILE_CSS_TAIL % (font.properties['weight'], font.properties['style'], font.properties['stretch'], range or font.properties['range']))
 
     def _generate_html(self, font, options):
         if 'fontsmoothie' in options:
@@ -171,22 +272,37 @@ class FontiePackage:
             fontsmoothie = ""
         return FILE_HTML % (fontsmoothie, font.cssname, font.cssname, font.properties['weight'], font.properties['style'], font.font.familyname, font.font.fullname)
 
-    def create(self):
-        id = "%s%s" % (PACKAGE_PREFIX, uuid.uuid4())
-        path = os.path.join(PACKAGE_ROOT, id, PACKAGE_NAME)
+    # NOTE A package can also be created at a given path outside of fontie,
+    #      e.g. in the output directory of a batch conversion
+    def create(self, path=None):
+        if path:
+            id = os.path.basename(path)
+            root = path
+        else:
+            id = "%s%s" % (PACKAGE_PREFIX, uuid.uuid4())
+            root = os.path.join(PACKAGE_ROOT, id)
+            path = os.path.join(root, PACKAGE_NAME)
         if os.path.exists(path):
             raise FontieException(409, "package path already exists")
         os.makedirs(path)
         self.id = id
+        self.root = root
         self.path = path
         self.fonts = []
+        # NOTE The janitor skips the package until it has been closed, a
+        #      package outside of fontie is left without a lock file
+        if root != path:
+            self._lock = hold(root)
 
     # NOTE Open does not restore the previously opened fonts
     def open(self, id):
         path = os.path.join(PACKAGE_ROOT, id, PACKAGE_NAME)
         if not os.path.exists(path):
             raise FontieException(404, "package path does not exist")
+        # NOTE The mtime of the package tells the janitor when it was used
+        os.utime(path)
         self.id = id
+        self.root = os.path.join(PACKAGE_ROOT, id)
         self.path = path
         self.fonts = []
 
@@ -194,69 +310,292 @@ class FontiePackage:
         while len(self.fonts):
             self.fonts[0].close(strict)
             del self.fonts[0]
+        if self.workspace != None:
+            self.workspace.destroy(strict)
+            self.workspace = None
+        if self._lock != None:
+            self._lock.close()
+            self._lock = None
 
     def destroy(self, strict=True):
         self.close(strict)
         if self.id:
             try:
-                shutil.rmtree(os.path.join(PACKAGE_ROOT, self.id))
+                with track(self.root):
+                    shutil.rmtree(self.root)
             except:
                 if strict: raise
                 traceback.print_exc()
         self.id = None
+        self.root = None
         self.path = None
 
+    # NOTE The fonts of a package share the workspace of the package, which
+    #      also accounts for the files written to the package itself
+    def _workspace(self):
+        if self.workspace == None:
+            check_quota()
+            self.workspace = FontieWorkspace()
+        return self.workspace
+
     def add(self, font):
-        self.fonts.append(FontieFont(id=font))
+        self.fonts.append(FontieFont(id=font, workspace=self._workspace()))
+
+    def load(self, source):
+        self.fonts.append(FontieFont(source=source, workspace=self._workspace()))
+
+    def cache_key(self, options):
+        return options_key([font.digest for font in self.fonts], options)
+
+    # NOTE Returns False if there is no cached build for the given options
+    def restore(self, options):
+        cachepath = PACKAGE_CACHE.get(self.cache_key(options))
+        if not cachepath:
+            return False
+        with self._workspace().track(self.path):
+            shutil.copytree(cachepath, self.path, dirs_exist_ok=True)
+        return True
+
+    def store(self, options):
+        try:
+            PACKAGE_CACHE.put(self.cache_key(options), self.path)
+        except:
+            # NOTE A failing cache must never fail the build itself
+            traceback.print_exc()
+
+    # NOTE Returns the stages of the per-font pipeline as pairs of stage and
+    #      argument. Subsetting moves in front of the glyph fixes and the
+    #      dehinting, so they do not work on glyphs that are thrown away, but
+    #      only where the result stays the same:
+    #      - The glyph fixes work on every glyph on its own and the subset is
+    #        closed under references, unless a fix changes the references of
+    #        a retained glyph or the references are fixed before.
+    #      - Dehinting strips every glyph on its own, unless generating the
+    #        TTF changes the references of a retained glyph. Real hinting
+    #        derives its global metrics from the whole font and stays in
+    #        front of the subset, so do the glyph fixes it depends on.
+    def plan(self, options):
+        fixes = list(options.get('fixes', []))
+        hinting = options.get('hinting')
+        late_hint = hinting == "nohint"
+        late_glyphs = "glyphs" in fixes and not "references" in fixes and (hinting == None or late_hint)
+        if not 'ranges' in options or not (late_hint or late_glyphs):
+            late_hint = late_glyphs = False
+        elif not all(font.plain_references(font.retained(options['ranges'])) for font in self.fonts):
+            late_hint = late_glyphs = False
+        plan = []
+        if late_glyphs:
+            fixes.remove("glyphs")
+        if fixes:
+            plan.append(("fix", fixes))
+        if hinting != None and not late_hint:
+            plan.append(("hint", hinting))
+        if 'ranges' in options:
+            plan.append(("subset", options['ranges']))
+        if late_glyphs:
+            plan.append(("fix", ["glyphs"]))
+        if late_hint:
+            plan.append(("hint", hinting))
+        if 'shards' in options:
+            plan.append(("shard", options['shards']))
+        if 'output' in options:
+            plan.append(("convert", options['output']))
+        return plan
+
+    def build(self, options, checkpoints=True):
+        self._stage("plan")
+        plan = self.plan(options)
+        print("Plan: %s" % describe_plan(plan))
+        if PACKAGE_WORKERS > 1 and len(self.fonts) > 1:
+            self._stage("fonts")
+            self._build_parallel(plan, checkpoints)
+        else:
+            resume = [self._resume(font, plan, checkpoints) for font in self.fonts]
+            for i, (stage, argument) in enumerate(plan):
+                self._stage(stage)
+                for font, (keys, start) in zip(self.fonts, resume):
+                    if i < start:
+                        continue
+                    self._build_step(font, stage, argument)
+                    if i < len(keys):
+                        self._checkpoint(font, keys[i])
+        if 'css' in options:
+            self._stage("css")
+            self.css(options['css'])
+        if 'html' in options:
+            self._stage("html")
+            self.html(options['html'])
+        generated = sum(font.generated for font in self.fonts)
+        reused = sum(font.reused for font in self.fonts)
+        print("Intermediates: %d generated, %d generates saved" % (generated, reused))
+
+    # NOTE Adds the requested fonts and builds the package, unless the result
+    #      of the same build is still in the cache
+    def make(self, options, cache=True):
+        try:
+            for font in options.get('font', []):
+                self.add(font)
+            if cache:
+                self._stage("cache")
+            if cache and self.restore(options):
+                print("Cache: hit for package %s" % self.id)
+            else:
+                self.build(options, cache)
+                if cache:
+                    self.store(options)
+        except:
+            # NOTE The workspace of a failed build is of no use to anybody
+            self._stage(None)
+            self.close(False)
+            raise
+        self._stage(None)
+        self.close()
 
     def read(self):
         # TODO Add fonts in path
         pass
 
-    def fix(self, options):
-        for font in self.fonts:
-            if "name" in options:
-                font.fix_name()
-            if "glyphs" in options:
-                font.fix_glyphs()
-            if "metrics" in options:
-                font.fix_metrics()
-            if "references" in options:
-                font.fix_references()
-
-    def hint(self, method):
-        for font in self.fonts:
-            font.hint(method)
+    def _fix_font(self, font, options):
+        if "name" in options:
+            font.fix_name()
+        if "glyphs" in options:
+            font.fix_glyphs()
+        if "metrics" in options:
+            font.fix_metrics()
+        if "references" in options:
+            font.fix_references()
 
-    def subset(self, ranges):
-        for font in self.fonts:
-            font.subset(ranges)
+    def _export_font(self, font, name, options):
+        paths = {}
+        for format in ["ttf", "otf", "woff", "woff2", "eot", "svg"]:
+            if format in options:
+                paths[format] = os.path.join(self.path, "%s.%s" % (name, format))
+        font.export(paths)
+        self.workspace.check()
+        return paths
+
+    # NOTE Splits a copy off the font for every shard that contains any of
+    #      its glyphs, a shard is subset like the font itself
+    def _shard_font(self, font, shards):
+        shards = [(name, unicodes) for name, unicodes in parse_shards(shards) if font.retained(unicodes)]
+        for name, unicodes in shards:
+            shard = font.copy(name, unicodes)
+            font.shards.append(shard)
+            shard.subset(unicodes)
+            shard.fix_lookups()
+
+    # NOTE Returns the faces of the font as pairs of the exported paths and
+    #      the unicode-range, which is only given for the shards of a font
+    def _convert_font(self, font, options):
+        if not font.shards:
+            return [(self._export_font(font, font.font.fullname, options), None)]
+        faces = []
+        for shard in font.shards:
+            paths = self._export_font(shard, "%s-%s" % (font.font.fullname, shard.shard), options)
+            faces.append((paths, str(shard_range(shard.unicodes, shard.codepoints()))))
+            font.generated += shard.generated
+            font.reused += shard.reused
+        while len(font.shards):
+            font.shards.pop().close()
+        return faces
+
+    def _build_step(self, font, stage, argument):
+        if stage == "fix":
+            self._fix_font(font, argument)
+        elif stage == "hint":
+            font.hint(argument)
+        elif stage == "subset":
+            font.subset(argument)
             font.fix_lookups()
+        elif stage == "shard":
+            self._shard_font(font, argument)
+        elif stage == "convert":
+            self.output[font.font.fullname] = self._convert_font(font, argument)
+
+    # NOTE Returns the checkpoint keys of the font for the leading stages of
+    #      the plan and the index of the first stage that has to be run, after
+    #      restoring the font from the latest checkpoint that exists
+    def _resume(self, font, plan, checkpoints=True):
+        keys = []
+        if checkpoints:
+            for i, (stage, argument) in enumerate(plan):
+                if not stage in CHECKPOINT_STAGES:
+                    break
+                keys.append(checkpoint_key(font.digest, plan[:i + 1]))
+        for i in range(len(keys), 0, -1):
+            path = CHECKPOINT_CACHE.get(keys[i - 1])
+            if not path:
+                continue
+            try:
+                font.restore(path)
+            except OSError:
+                # NOTE The checkpoint might have been evicted meanwhile
+                traceback.print_exc()
+                continue
+            print("Checkpoint: resuming %s after %s" % (font.id, describe_plan(plan[:i])))
+            return (keys, i)
+        return (keys, 0)
+
+    def _checkpoint(self, font, key):
+        path = os.path.join(self.workspace.path, "checkpoint-%s" % uuid.uuid4())
+        try:
+            # NOTE The checkpoints count against the storage quota
+            check_quota()
+            font.checkpoint(path)
+            CHECKPOINT_CACHE.put(key, path)
+        except FontieException as e:
+            print("Checkpoint: %s" % e.message)
+        except:
+            # NOTE A failing checkpoint must never fail the build itself
+            traceback.print_exc()
+        finally:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+    # NOTE Runs the whole per-font pipeline inside a worker process. The font
+    #      state is handed back to the parent through the working copy on
+    #      disk, since fontforge fonts cannot be pickled.
+    def _build_font(self, index, plan, checkpoints=True):
+        font = self.fonts[index]
+        try:
+            keys, start = self._resume(font, plan, checkpoints)
+            for i, (stage, argument) in enumerate(plan[start:], start):
+                self._stage(stage)
+                self._build_step(font, stage, argument)
+                if i < len(keys):
+                    self._checkpoint(font, keys[i])
+            self._stage(None)
+            faces = self.output.get(font.font.fullname) if self.output else None
+            font.save()
+        finally:
+            METRICS_STORE.flush()
+        return (faces, font.generated, font.reused)
+
+    def _build_parallel(self, plan, checkpoints=True):
+        for font in self.fonts:
+            font.save()
+        context = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(min(PACKAGE_WORKERS, len(self.fonts)), mp_context=context) as executor:
+            futures = [executor.submit(self._build_font, index, plan, checkpoints) for index in range(len(self.fonts))]
+            concurrent.futures.wait(futures)
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+        for font, future in zip(self.fonts, futures):
+            faces, generated, reused = future.result()
+            font.generated += generated
+            font.reused += reused
+            if faces != None:
+                self.output[font.font.fullname] = faces
 
     def convert(self, options):
         for font in self.fonts:
-            paths = {}
-            if "ttf" in options:
-                paths['ttf'] = os.path.join(self.path, "%s.ttf" % (font.font.fullname))
-                font.export_ttf(paths['ttf'])
-            if "otf" in options:
-                paths['otf'] = os.path.join(self.path, "%s.otf" % (font.font.fullname))
-                font.export_otf(paths['otf'])
-            if "woff" in options:
-                paths['woff'] = os.path.join(self.path, "%s.woff" % (font.font.fullname))
-                font.export_woff(paths['woff'])
-            if "woff2" in options:
-                paths['woff2'] = os.path.join(self.path, "%s.woff2" % (font.font.fullname))
-                font.export_woff2(paths['woff2'])
-            if "eot" in options:
-                paths['eot'] = os.path.join(self.path, "%s.eot" % (font.font.fullname))
-                font.export_eot(paths['eot'])
-            if "svg" in options:
-                paths['svg'] = os.path.join(self.path, "%s.svg" % (font.font.fullname))
-                font.export_svg(paths['svg'])
-            self.output[font.font.fullname] = paths
+            self.output[font.font.fullname] = self._convert_font(font, options)
 
+    # NOTE The inlined fonts are removed only after every CSS file has been
+    #      written completely
     def css(self, options):
+        workspace = self._workspace()
         header = "/* Generated by Fontie <http://fontie.pixelsvsbytes.com> */"
         css = {}
         for font in self.fonts:
@@ -264,27 +603,47 @@ class FontiePackage:
                 font.cssname = font.font.familyname
             else:
                 font.cssname = font.font.fullname
-            if not font.cssname in css:
-                css[font.cssname] = header
-            css[font.cssname] = "%s\n\n%s" % (css[font.cssname], self._generate_css(font, options))
-        for name, src in css.items():
+            css.setdefault(font.cssname, []).append(font)
+        inlined = set()
+        for name, fonts in css.items():
             path = os.path.join(self.path, "%s.css" % name)
-            with open(path, 'w') as file:
-                file.write(src)
+            tmppath = "%s.tmp" % path
+            with workspace.track(path, tmppath):
+                try:
+                    with open(tmppath, 'w') as file:
+                        file.write(header)
+                        for font in fonts:
+                            for paths, range in self.output[font.font.fullname]:
+                                file.write("\n\n")
+                                self._write_css(file, font, paths, range, options, inlined)
+                    os.rename(tmppath, path)
+                except:
+                    if os.path.exists(tmppath):
+                        os.remove(tmppath)
+                    raise
+        with workspace.track(*inlined):
+            for path in inlined:
+                os.remove(path)
+        workspace.check()
 
     def html(self, options):
+        workspace = self._workspace()
         for font in self.fonts:
             html = self._generate_html(font, options)
-            with open(os.path.join(self.path, '%s.html' % font.font.fullname), 'w') as file:
+            path = os.path.join(self.path, '%s.html' % font.font.fullname)
+            with workspace.track(path), open(path, 'w') as file:
                 file.write(html)
         if 'fontsmoothie' in options:
-            shutil.copyfile(FONTSMOOTHIE, os.path.join(self.path, "fontsmoothie.min.js"))
+            path = os.path.join(self.path, "fontsmoothie.min.js")
+            with workspace.track(path):
+                shutil.copyfile(FONTSMOOTHIE, path)
+        workspace.check()
 
-    def zip(self):
-        bytes = io.BytesIO()
-        zip = zipfile.ZipFile(bytes, "w")
+    # NOTE The file does not need to be seekable, so the archive can be
+    #      streamed directly to a socket without ever being held in memory
+    def zip(self, file):
+        zip = zipfile.ZipFile(file, "w")
         for root, dirnames, filenames in os.walk(self.path):
             for filename in filenames:
                 zip.write(os.path.join(root, filename), os.path.join(os.path.basename(self.path),filename))
         zip.close()
-        return bytes
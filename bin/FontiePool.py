@@ -0,0 +1,100 @@
+import os
+import sys
+import signal
+import resource
+import traceback
+
+# INFO Pool of pre-forked, long-lived workers
+#
+#      All workers accept requests from the listening socket of the server,
+#      which has been bound by the master before forking. Everything imported
+#      by the master (e.g. fontforge) is therefore already loaded in a fresh
+#      worker. A worker exits after a number of requests or as soon as its
+#      RSS passes a limit, and the master replaces it with a new one, so leaks
+#      inside fontforge do not pile up. The janitor, if given, runs in a
+#      process of its own that is replaced the same way.
+class FontiePool:
+    def __init__(self, server, size, max_jobs, max_rss, janitor=None):
+        self.server = server
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.janitor = janitor
+        self.workers = set()
+        self.janitor_pid = None
+        self.stopping = False
+
+    def _rss(self):
+        try:
+            with open("/proc/self/statm", 'r') as file:
+                return int(file.read().split()[1]) * resource.getpagesize()
+        except (OSError, ValueError, IndexError):
+            # NOTE Fall back to the peak RSS, which is reported in kB on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.workers) + ([self.janitor_pid] if self.janitor_pid else []):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def _fork(self, target):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                target()
+            except:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        return pid
+
+    def _spawn(self):
+        self.workers.add(self._fork(self._work))
+
+    def _spawn_janitor(self):
+        self.janitor_pid = self._fork(self.janitor.run)
+
+    def _work(self):
+        self.workers = set()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'stopping', True))
+        while not self.stopping:
+            self.server.handle_request()
+            if self.server.jobs >= self.max_jobs:
+                print("Worker %d is recycled after %d jobs" % (os.getpid(), self.server.jobs))
+                break
+            rss = self._rss()
+            if rss > self.max_rss:
+                print("Worker %d is recycled at %d bytes RSS" % (os.getpid(), rss))
+                break
+
+    def run(self):
+        # NOTE Idle workers must not block in accept while another worker has
+        #      already taken the connection, otherwise they could not stop
+        self.server.socket.setblocking(False)
+        signal.signal(signal.SIGTERM, self._stop)
+        for i in range(self.size):
+            self._spawn()
+        if self.janitor:
+            self._spawn_janitor()
+        while self.workers or self.janitor_pid:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid in self.workers:
+                self.workers.remove(pid)
+                if not self.stopping:
+                    self._spawn()
+            elif pid == self.janitor_pid:
+                self.janitor_pid = None
+                if not self.stopping:
+                    self._spawn_janitor()
+        return 0
@@ -0,0 +1,115 @@
+import re
+import bisect
+
+from FontieException import FontieException
+
+UNICODE_MAX = 0x10FFFF
+RANGE_PATTERN = re.compile('^(?:U\\+)?([\\dA-F?]+)(?:-(?:U\\+)?([\\dA-F]+))?$', re.IGNORECASE)
+SHARD_PATTERN = re.compile('^([\\w-]+)(?:=(.+))?$')
+
+# NOTE Predefined shards, which are split off a font for the scripts they
+#      cover. Some combining marks and symbols belong to more than one script.
+# REF https://fonts.googleapis.com/css2?family=Roboto
+SHARDS = {
+    'latin': "0000-00FF,0131,0152-0153,02BB-02BC,02C6,02DA,02DC,0304,0308,0329,2000-206F,2074,20AC,2122,2191,2193,2212,2215,FEFF,FFFD",
+    'latin-ext': "0100-02AF,0304,0308,0329,1E00-1E9F,1EF2-1EFF,2020,20A0-20AB,20AD-20C0,2113,2C60-2C7F,A720-A7FF",
+    'cyrillic': "0301,0400-045F,0490-0491,04B0-04B1,2116",
+    'cyrillic-ext': "0460-052F,1C80-1C88,20B4,2DE0-2DFF,A640-A69F,FE2E-FE2F",
+    'greek': "0370-0377,037A-037F,0384-038A,038C,038E-03A1,03A3-03FF",
+    'greek-ext': "1F00-1FFF",
+    'vietnamese': "0102-0103,0110-0111,0128-0129,0168-0169,01A0-01A1,01AF-01B0,0300-0301,0303-0304,0308-0309,0323,0329,1EA0-1EF9,20AB"
+}
+
+# INFO Set of unicode codepoints stored as sorted, disjoint and inclusive
+#      intervals, so even U+0-10FFFF is only a single pair of integers
+class FontieRange:
+    def __init__(self, intervals=None):
+        self.intervals = []
+        for start, end in sorted(intervals or []):
+            if self.intervals and start <= self.intervals[-1][1] + 1:
+                if end > self.intervals[-1][1]:
+                    self.intervals[-1] = (self.intervals[-1][0], end)
+            else:
+                self.intervals.append((start, end))
+        self._starts = [interval[0] for interval in self.intervals]
+
+    # NOTE Accepts a list of strings like "0020-007F,20AC", "U+A0-FF" or
+    #      "U+4??", where the end of a range is inclusive like in CSS
+    @classmethod
+    def parse(cls, ranges):
+        if isinstance(ranges, FontieRange):
+            return ranges
+        if isinstance(ranges, str):
+            ranges = [ranges]
+        intervals = []
+        for r in ranges:
+            for part in r.split(","):
+                part = part.strip()
+                if not part:
+                    continue
+                m = RANGE_PATTERN.search(part)
+                if not m or ("?" in m.group(1) and m.group(2)):
+                    raise FontieException(400, "invalid unicode range")
+                start = int(m.group(1).replace("?", "0"), 16)
+                if m.group(2):
+                    end = int(m.group(2), 16)
+                else:
+                    end = int(m.group(1).replace("?", "F"), 16)
+                if start > end or end > UNICODE_MAX:
+                    raise FontieException(400, "invalid unicode range")
+                intervals.append((start, end))
+        # NOTE An empty value would silently subset a font to nothing
+        if not intervals:
+            raise FontieException(400, "empty unicode range")
+        return cls(intervals)
+
+    @classmethod
+    def from_codepoints(cls, codepoints):
+        intervals = []
+        for codepoint in sorted(set(codepoints)):
+            if intervals and codepoint == intervals[-1][1] + 1:
+                intervals[-1] = (intervals[-1][0], codepoint)
+            else:
+                intervals.append((codepoint, codepoint))
+        return cls(intervals)
+
+    def __contains__(self, codepoint):
+        i = bisect.bisect_right(self._starts, codepoint) - 1
+        return i >= 0 and codepoint <= self.intervals[i][1]
+
+    def __bool__(self):
+        return len(self.intervals) > 0
+
+    def __str__(self):
+        result = []
+        for start, end in self.intervals:
+            if start == end:
+                result.append("U+%X" % start)
+            else:
+                result.append("U+%X-%X" % (start, end))
+        return ",".join(result)
+
+# NOTE The unicode-range of a shard only lists the codepoints of the glyphs
+#      in the shard that were requested for it. Glyphs that are only kept as
+#      references, e.g. the Latin A of a Cyrillic A, would otherwise make the
+#      browser download the shard for text that does not need it.
+def shard_range(unicodes, codepoints):
+    return FontieRange.from_codepoints(codepoint for codepoint in codepoints if codepoint in unicodes)
+
+# NOTE Accepts a list of predefined shard names and user-defined shards like
+#      "arrows=2190-21FF", the names are used in the file names of the shards
+def parse_shards(shards):
+    result = []
+    for shard in shards:
+        m = SHARD_PATTERN.search(shard.strip())
+        if not m:
+            raise FontieException(400, "invalid shard")
+        name, ranges = m.group(1), m.group(2)
+        if ranges == None:
+            if not name in SHARDS:
+                raise FontieException(400, "unknown shard")
+            ranges = SHARDS[name]
+        if any(name == r[0] for r in result):
+            raise FontieException(400, "duplicate shard")
+        result.append((name, FontieRange.parse(ranges)))
+    return result
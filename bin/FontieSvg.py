@@ -0,0 +1,186 @@
+from xml.sax.saxutils import quoteattr
+
+# REF https://www.w3.org/TR/SVG11/fonts.html
+
+SVG_HEAD = '<?xml version="1.0" standalone="no"?><svg xmlns="http://www.w3.org/2000/svg"><defs>'
+SVG_TAIL = '</font></defs></svg>'
+
+def _number(value):
+    value = round(value, 2)
+    if value == int(value):
+        return "%d" % value
+    result = ("%.2f" % value).rstrip("0")
+    return result.replace("0.", ".", 1) if abs(value) < 1 else result
+
+# NOTE Separators are only written where the next number could not be told
+#      apart from the previous one otherwise
+def _coordinates(*points):
+    result = ""
+    previous = None
+    for x, y in points:
+        for value in [_number(x), _number(y)]:
+            if previous != None and not value.startswith("-") and not (value.startswith(".") and "." in previous):
+                result += " "
+            result += value
+            previous = value
+    return result
+
+def _midpoint(a, b):
+    return ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+
+# NOTE The off-curve points between two on-curve points are collected and
+#      written as one segment, so a contour that wraps around its start or
+#      ends in control points never indexes past its last point
+def _segment(controls, end, quadratic):
+    if not controls:
+        return "L" + _coordinates(end[:2])
+    if len(controls) == 1:
+        return "Q" + _coordinates(controls[0][:2], end[:2])
+    if not quadratic:
+        return "C" + _coordinates(controls[0][:2], controls[-1][:2], end[:2])
+    # NOTE Two off-curve points imply an on-curve point between them
+    result = ""
+    for a, b in zip(controls, controls[1:]):
+        result += "Q" + _coordinates(a[:2], _midpoint(a, b))
+    return result + "Q" + _coordinates(controls[-1][:2], end[:2])
+
+def _contour(contour):
+    points = [(point.x, point.y, point.on_curve) for point in contour]
+    if len(points) < 2:
+        return ""
+    if contour.closed:
+        start = next((i for i, point in enumerate(points) if point[2]), None)
+        if start == None:
+            # NOTE A quadratic contour might consist of off-curve points only
+            points.insert(0, _midpoint(points[-1], points[0]) + (True,))
+            start = 0
+        points = points[start:] + points[:start + 1]
+    else:
+        # NOTE An open contour can neither start nor end with a control point
+        while points and not points[0][2]:
+            points.pop(0)
+        while points and not points[-1][2]:
+            points.pop()
+        if len(points) < 2:
+            return ""
+    path = ["M" + _coordinates(points[0][:2])]
+    controls = []
+    for point in points[1:]:
+        if point[2]:
+            path.append(_segment(controls, point, contour.is_quadratic))
+            controls = []
+        else:
+            controls.append(point)
+    if contour.closed:
+        # NOTE The closepath already draws the line back to the start
+        if path[-1][0] == "L":
+            path.pop()
+        path.append("Z")
+    return "".join(path)
+
+def _layer(font, glyph):
+    layer = glyph.foreground.dup()
+    for reference in glyph.references:
+        if reference[0] in font:
+            component = _layer(font, font[reference[0]])
+            component.transform(reference[1])
+            layer += component
+    return layer
+
+def _text(codepoints):
+    result = ""
+    for codepoint in codepoints:
+        char = chr(codepoint)
+        if codepoint < 0x20 or 0xD800 <= codepoint <= 0xDFFF or char in "&<>\"'":
+            result += "&#x%X;" % codepoint
+        else:
+            result += char
+    return '"%s"' % result
+
+def _glyph(glyph, codepoints, d, tag="glyph"):
+    result = '<%s glyph-name=%s' % (tag, quoteattr(glyph.glyphname))
+    if codepoints:
+        result += ' unicode=%s' % _text(codepoints)
+    result += ' horiz-adv-x="%d"' % glyph.width
+    if d:
+        result += ' d="%s"' % d
+    return result + "/>"
+
+def _path(font, glyph):
+    return "".join(_contour(contour) for contour in _layer(font, glyph))
+
+def _kerning_subtables(font):
+    for lookup in font.gpos_lookups:
+        info = font.getLookupInfo(lookup)
+        if info[0] == "gpos_pair" and any(feature[0] == "kern" for feature in info[2]):
+            for subtable in font.getLookupSubtables(lookup):
+                yield subtable
+
+def _hkern(first, second, k):
+    return '<hkern g1=%s g2=%s k="%s"/>' % (quoteattr(",".join(first)), quoteattr(",".join(second)), _number(k))
+
+# NOTE SVG fonts only know horizontal kerning, so of each kerning pair only
+#      the advance adjustment of its first glyph is kept. Glyph names that
+#      contain a comma can not be referenced by g1/g2 and are left out
+def _kerning(font, names, file):
+    for subtable in _kerning_subtables(font):
+        if font.isKerningClass(subtable):
+            firsts, seconds, offsets = font.getKerningClass(subtable)
+            for i, first in enumerate(firsts):
+                first = [name for name in first or () if name in names]
+                for j, second in enumerate(seconds):
+                    second = [name for name in second or () if name in names]
+                    if first and second and offsets[i * len(seconds) + j]:
+                        file.write(_hkern(first, second, -offsets[i * len(seconds) + j]))
+        else:
+            for name in sorted(names):
+                for possub in font[name].getPosSub(subtable):
+                    if possub[1] == "Pair" and possub[2] in names and possub[5]:
+                        file.write(_hkern([name], [possub[2]], -possub[5]))
+
+# NOTE Writes a minified SVG font glyph by glyph, so only the outline of a
+#      single glyph is held in memory at any time
+def svg(font, properties, file):
+    file.write(SVG_HEAD)
+    file.write('<font id=%s horiz-adv-x="%d">' % (quoteattr(font.fontname), font.em))
+    bbox = font.boundingBox()
+    face = {
+        'font-family': font.familyname,
+        'font-weight': properties['weight'],
+        'font-style': properties['style'],
+        'font-stretch': properties['stretch'],
+        'units-per-em': "%d" % font.em,
+        'panose-1': " ".join("%d" % value for value in font.os2_panose),
+        'ascent': "%d" % font.ascent,
+        'descent': "%d" % -font.descent,
+        'bbox': " ".join(_number(value) for value in bbox),
+        'x-height': _number(font.xHeight),
+        'cap-height': _number(font.capHeight),
+        'underline-thickness': _number(font.uwidth),
+        'underline-position': _number(font.upos),
+        'unicode-range': properties['range']
+    }
+    file.write("<font-face %s/>" % " ".join("%s=%s" % (name, quoteattr(str(value))) for name, value in face.items()))
+    if ".notdef" in font:
+        file.write(_glyph(font[".notdef"], None, _path(font, font[".notdef"]), "missing-glyph"))
+    names = set()
+    for glyph in font.glyphs():
+        if glyph.glyphname == ".notdef" or not glyph.isWorthOutputting():
+            continue
+        codepoints = []
+        if glyph.unicode >= 0:
+            codepoints.append([glyph.unicode])
+        if glyph.altuni:
+            codepoints += [[altuni[0]] for altuni in glyph.altuni]
+        # NOTE Ligatures are matched by the sequence of their components
+        for possub in glyph.getPosSub("*"):
+            if possub[1] == "Ligature" and all(name in font and font[name].unicode >= 0 for name in possub[2:]):
+                codepoints.append([font[name].unicode for name in possub[2:]])
+        if codepoints:
+            d = _path(font, glyph)
+            for sequence in codepoints:
+                file.write(_glyph(glyph, sequence, d))
+            if "," not in glyph.glyphname:
+                names.add(glyph.glyphname)
+    _kerning(font, names, file)
+    file.write(SVG_TAIL)
@@ -0,0 +1,278 @@
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# REF https://www.w3.org/TR/WOFF/
+# REF https://www.w3.org/TR/WOFF2/
+
+# NOTE The index of a tag in this list is its known table tag in WOFF2
+WOFF2_TAGS = [
+    b"cmap", b"head", b"hhea", b"hmtx", b"maxp", b"name", b"OS/2", b"post",
+    b"cvt ", b"fpgm", b"glyf", b"loca", b"prep", b"CFF ", b"VORG", b"EBDT",
+    b"EBLC", b"gasp", b"hdmx", b"kern", b"LTSH", b"PCLT", b"VDMX", b"vhea",
+    b"vmtx", b"BASE", b"GDEF", b"GPOS", b"GSUB", b"EBSC", b"JSTF", b"MATH",
+    b"CBDT", b"CBLC", b"COLR", b"CPAL", b"SVG ", b"sbix", b"acnt", b"avar",
+    b"bdat", b"bloc", b"bsln", b"cvar", b"fdsc", b"feat", b"fmtx", b"fvar",
+    b"gvar", b"hsty", b"just", b"lcar", b"mort", b"morx", b"opbd", b"prop",
+    b"trak", b"Zapf", b"Silf", b"Glat", b"Gloc", b"Feat", b"Sill"
+]
+
+# NOTE Glyph flags of the glyf table
+ON_CURVE = 0x01
+X_SHORT = 0x02
+Y_SHORT = 0x04
+REPEAT = 0x08
+X_SAME = 0x10
+Y_SAME = 0x20
+OVERLAP_SIMPLE = 0x40
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+WE_HAVE_INSTRUCTIONS = 0x0100
+
+def _pad4(data):
+    return data + b"\0" * (-len(data) % 4)
+
+def read_sfnt(data):
+    flavor, count = struct.unpack(">IH", data[:6])
+    tables = {}
+    for i in range(count):
+        tag, checksum, offset, length = struct.unpack(">4sIII", data[12 + 16*i:28 + 16*i])
+        tables[tag] = (checksum, data[offset:offset + length])
+    return flavor, tables
+
+def _sfnt_size(tables):
+    return 12 + 16 * len(tables) + sum(len(_pad4(table[1])) for table in tables.values())
+
+def woff(data, level=9):
+    flavor, tables = read_sfnt(data)
+    tags = sorted(tables)
+    offset = 44 + 20 * len(tags)
+    directory = []
+    blocks = []
+    for tag in tags:
+        checksum, table = tables[tag]
+        compressed = zlib.compress(table, level)
+        # NOTE A table is only stored compressed if that makes it smaller
+        if len(compressed) >= len(table):
+            compressed = table
+        directory.append(struct.pack(">4sIIII", tag, offset, len(compressed), len(table), checksum))
+        blocks.append(_pad4(compressed))
+        offset += len(blocks[-1])
+    header = struct.pack(">4sIIHHIHHIIIII", b"wOFF", flavor, offset, len(tags), 0, _sfnt_size(tables), 1, 0, 0, 0, 0, 0, 0)
+    return b"".join([header] + directory + blocks)
+
+def _uint_base128(value):
+    result = [value & 0x7f]
+    value >>= 7
+    while value:
+        result.insert(0, 0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(result)
+
+def _uint_255(value):
+    if value < 253:
+        return bytes([value])
+    elif value < 506:
+        return bytes([255, value - 253])
+    elif value < 762:
+        return bytes([254, value - 506])
+    else:
+        return bytes([253, value >> 8, value & 0xff])
+
+def _triplet(flags, glyphs, on_curve, x, y):
+    abs_x = abs(x)
+    abs_y = abs(y)
+    on_curve_bit = 0 if on_curve else 128
+    x_sign_bit = 0 if x < 0 else 1
+    y_sign_bit = 0 if y < 0 else 1
+    xy_sign_bits = x_sign_bit + 2 * y_sign_bit
+    if x == 0 and abs_y < 1280:
+        flags.append(on_curve_bit + ((abs_y & 0xf00) >> 7) + y_sign_bit)
+        glyphs.append(abs_y & 0xff)
+    elif y == 0 and abs_x < 1280:
+        flags.append(on_curve_bit + 10 + ((abs_x & 0xf00) >> 7) + x_sign_bit)
+        glyphs.append(abs_x & 0xff)
+    elif abs_x < 65 and abs_y < 65:
+        flags.append(on_curve_bit + 20 + ((abs_x - 1) & 0x30) + (((abs_y - 1) & 0x30) >> 2) + xy_sign_bits)
+        glyphs.append((((abs_x - 1) & 0xf) << 4) | ((abs_y - 1) & 0xf))
+    elif abs_x < 769 and abs_y < 769:
+        flags.append(on_curve_bit + 84 + 12 * (((abs_x - 1) & 0x300) >> 8) + (((abs_y - 1) & 0x300) >> 6) + xy_sign_bits)
+        glyphs.append((abs_x - 1) & 0xff)
+        glyphs.append((abs_y - 1) & 0xff)
+    elif abs_x < 4096 and abs_y < 4096:
+        flags.append(on_curve_bit + 120 + xy_sign_bits)
+        glyphs.append(abs_x >> 4)
+        glyphs.append(((abs_x & 0xf) << 4) | (abs_y >> 8))
+        glyphs.append(abs_y & 0xff)
+    else:
+        flags.append(on_curve_bit + 124 + xy_sign_bits)
+        glyphs.append(abs_x >> 8)
+        glyphs.append(abs_x & 0xff)
+        glyphs.append(abs_y >> 8)
+        glyphs.append(abs_y & 0xff)
+
+def _coordinates(data, offset, flags, short, same):
+    values = []
+    for flag in flags:
+        if flag & short:
+            value = data[offset]
+            offset += 1
+            values.append(value if flag & same else -value)
+        elif flag & same:
+            values.append(0)
+        else:
+            values.append(struct.unpack(">h", data[offset:offset + 2])[0])
+            offset += 2
+    return values, offset
+
+# NOTE Splits the glyf table into the separate streams of the WOFF2 glyf
+#      transform, the loca table is rebuilt from it by the decoder
+def _transform_glyf(glyf, loca, index_format, count):
+    if index_format:
+        offsets = struct.unpack(">%dI" % (count + 1), loca[:4 * (count + 1)])
+    else:
+        offsets = [offset * 2 for offset in struct.unpack(">%dH" % (count + 1), loca[:2 * (count + 1)])]
+    contour_stream = bytearray()
+    points_stream = bytearray()
+    flag_stream = bytearray()
+    glyph_stream = bytearray()
+    composite_stream = bytearray()
+    bbox_bitmap = bytearray(((count + 31) >> 5) << 2)
+    bbox_stream = bytearray()
+    instruction_stream = bytearray()
+    overlap_bitmap = bytearray((count + 7) >> 3)
+    overlap = False
+    for i in range(count):
+        data = glyf[offsets[i]:offsets[i + 1]]
+        if len(data) == 0:
+            contour_stream += struct.pack(">h", 0)
+            continue
+        contours, x_min, y_min, x_max, y_max = struct.unpack(">hhhhh", data[:10])
+        contour_stream += struct.pack(">h", contours)
+        if contours > 0:
+            ends = struct.unpack(">%dH" % contours, data[10:10 + 2 * contours])
+            offset = 10 + 2 * contours
+            instructions = struct.unpack(">H", data[offset:offset + 2])[0]
+            offset += 2
+            code = data[offset:offset + instructions]
+            offset += instructions
+            points = ends[-1] + 1
+            previous = -1
+            for end in ends:
+                points_stream += _uint_255(end - previous)
+                previous = end
+            flags = []
+            while len(flags) < points:
+                flag = data[offset]
+                offset += 1
+                flags.append(flag)
+                if flag & REPEAT:
+                    flags += [flag] * data[offset]
+                    offset += 1
+            xs, offset = _coordinates(data, offset, flags, X_SHORT, X_SAME)
+            ys, offset = _coordinates(data, offset, flags, Y_SHORT, Y_SAME)
+            if flags[0] & OVERLAP_SIMPLE:
+                overlap_bitmap[i >> 3] |= 0x80 >> (i & 7)
+                overlap = True
+            x = 0
+            y = 0
+            bounds = None
+            for flag, dx, dy in zip(flags, xs, ys):
+                _triplet(flag_stream, glyph_stream, flag & ON_CURVE, dx, dy)
+                x += dx
+                y += dy
+                if bounds:
+                    bounds = (min(bounds[0], x), min(bounds[1], y), max(bounds[2], x), max(bounds[3], y))
+                else:
+                    bounds = (x, y, x, y)
+            glyph_stream += _uint_255(instructions)
+            instruction_stream += code
+            # NOTE The decoder computes the bounding box of simple glyphs
+            #      itself, so it is only stored if it differs from that
+            if bounds != (x_min, y_min, x_max, y_max):
+                bbox_bitmap[i >> 3] |= 0x80 >> (i & 7)
+                bbox_stream += struct.pack(">hhhh", x_min, y_min, x_max, y_max)
+        elif contours < 0:
+            offset = 10
+            more = True
+            instructions = False
+            while more:
+                flags = struct.unpack(">H", data[offset:offset + 2])[0]
+                size = 4 + (4 if flags & ARG_1_AND_2_ARE_WORDS else 2)
+                if flags & WE_HAVE_A_SCALE:
+                    size += 2
+                elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                    size += 4
+                elif flags & WE_HAVE_A_TWO_BY_TWO:
+                    size += 8
+                composite_stream += data[offset:offset + size]
+                offset += size
+                more = flags & MORE_COMPONENTS
+                instructions = instructions or flags & WE_HAVE_INSTRUCTIONS
+            if instructions:
+                length = struct.unpack(">H", data[offset:offset + 2])[0]
+                glyph_stream += _uint_255(length)
+                instruction_stream += data[offset + 2:offset + 2 + length]
+            bbox_bitmap[i >> 3] |= 0x80 >> (i & 7)
+            bbox_stream += struct.pack(">hhhh", x_min, y_min, x_max, y_max)
+    bbox_stream = bbox_bitmap + bbox_stream
+    streams = [contour_stream, points_stream, flag_stream, glyph_stream, composite_stream, bbox_stream, instruction_stream]
+    header = struct.pack(">HHHH7I", 0, 1 if overlap else 0, count, index_format, *[len(stream) for stream in streams])
+    return b"".join([header] + [bytes(stream) for stream in streams] + ([bytes(overlap_bitmap)] if overlap else []))
+
+# NOTE The tables are ordered by tag like woff2_compress does, except that a
+#      transformed loca has to follow glyf directly, since the decoder
+#      rebuilds both from the transformed glyf
+def _woff2_order(tables, transform):
+    tags = sorted(tables)
+    if transform:
+        tags.remove(b"loca")
+        tags.insert(tags.index(b"glyf") + 1, b"loca")
+    return tags
+
+def woff2(data, quality=11):
+    if brotli == None:
+        raise Exception("woff2 encoding requires the brotli module")
+    flavor, tables = read_sfnt(data)
+    transform = b"glyf" in tables and b"loca" in tables
+    size = _sfnt_size(tables)
+    directory = []
+    blocks = []
+    for tag in _woff2_order(tables, transform):
+        checksum, table = tables[tag]
+        index = WOFF2_TAGS.index(tag) if tag in WOFF2_TAGS else 63
+        # NOTE For glyf and loca the transform version 0 is the actual
+        #      transform, while version 3 means that they are not transformed
+        version = 0 if transform or not tag in [b"glyf", b"loca"] else 3
+        entry = bytes([index | (version << 6)])
+        if index == 63:
+            entry += tag
+        entry += _uint_base128(len(table))
+        if transform and tag == b"glyf":
+            head = tables[b"head"][1]
+            count = struct.unpack(">H", tables[b"maxp"][1][4:6])[0]
+            index_format = struct.unpack(">h", head[50:52])[0]
+            table = _transform_glyf(table, tables[b"loca"][1], index_format, count)
+            entry += _uint_base128(len(table))
+        elif transform and tag == b"loca":
+            table = b""
+            entry += _uint_base128(0)
+        elif transform and tag == b"head":
+            # NOTE Bit 11 marks fonts, which are not binary identical to the
+            #      original after a lossless transformation
+            flags = struct.unpack(">H", table[16:18])[0] | 0x0800
+            table = table[:16] + struct.pack(">H", flags) + table[18:]
+        directory.append(entry)
+        blocks.append(table)
+    compressed = brotli.compress(b"".join(blocks), mode=brotli.MODE_FONT, quality=quality)
+    directory = b"".join(directory)
+    length = 48 + len(directory) + len(_pad4(compressed))
+    header = struct.pack(">4sIIHHIIHHIIIII", b"wOF2", flavor, length, len(tables), 0, size, len(compressed), 1, 0, 0, 0, 0, 0, 0)
+    return header + directory + _pad4(compressed)
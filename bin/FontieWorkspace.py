@@ -0,0 +1,195 @@
+import os
+import uuid
+import shutil
+import fcntl
+import traceback
+import contextlib
+
+from FontieException import FontieException
+from FontieCache import path_size, count_stats, read_stats, STATS_NAME
+
+# NOTE All storage locations can be set from the environment. The originals
+#      should stay on persistent storage, while the workspaces only hold
+#      working copies and intermediates and can be put on a tmpfs like
+#      /dev/shm to keep the many small generate/read cycles off the disk.
+FONT_ROOT = os.environ.get("FONTIE_FONT_ROOT", "/tmp")
+FONT_PREFIX = "font_"
+PACKAGE_ROOT = os.environ.get("FONTIE_PACKAGE_ROOT", "/tmp")
+PACKAGE_PREFIX = "fontie_"
+WORKSPACE_ROOT = os.environ.get("FONTIE_WORKSPACE_ROOT", "/tmp")
+WORKSPACE_PREFIX = "work_"
+# NOTE The checkpoints of the package builds are shared by all jobs
+CHECKPOINT_ROOT = os.environ.get("FONTIE_CHECKPOINT_ROOT", "/tmp/fontie-checkpoints")
+CHECKPOINT_PREFIX = "checkpoint_"
+
+# NOTE Byte quotas for a single job and for everything stored by fontie in
+#      the locations above, a value of 0 disables the quota
+WORKSPACE_JOB_QUOTA = int(os.environ.get("FONTIE_JOB_QUOTA", 512*1024*1024))
+WORKSPACE_QUOTA = int(os.environ.get("FONTIE_QUOTA", 8*1024*1024*1024))
+
+# NOTE The running byte counters of the stores and of every workspace
+USAGE_ROOT = os.environ.get("FONTIE_USAGE_ROOT", "/tmp/fontie-usage")
+
+# NOTE A directory is in use as long as a shared lock is held on this file
+LOCK_NAME = ".lock"
+
+STORES = [
+    (FONT_ROOT, FONT_PREFIX),
+    (PACKAGE_ROOT, PACKAGE_PREFIX),
+    (WORKSPACE_ROOT, WORKSPACE_PREFIX),
+    (CHECKPOINT_ROOT, CHECKPOINT_PREFIX)
+]
+
+def _size(path):
+    try:
+        return path_size(path)
+    except OSError:
+        return 0
+
+# NOTE Tells whether a path belongs to one of the stores, e.g. the package of
+#      a batch conversion is written outside of them and does not count
+def stored(path):
+    path = os.path.abspath(path)
+    for root, prefix in STORES:
+        relpath = os.path.relpath(path, os.path.abspath(root))
+        if not relpath.startswith(os.pardir) and relpath.split(os.sep)[0].startswith(prefix):
+            return True
+    return False
+
+# NOTE Returns the lock file of the directory, which must be kept open until
+#      the directory is no longer in use. Forked children share the lock.
+def hold(path):
+    file = open(os.path.join(path, LOCK_NAME), 'a')
+    fcntl.flock(file, fcntl.LOCK_SH)
+    return file
+
+def in_use(path):
+    try:
+        with open(os.path.join(path, LOCK_NAME), 'r') as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(file, fcntl.LOCK_UN)
+    except OSError:
+        pass
+    return False
+
+def account(delta):
+    if delta:
+        count_stats(os.path.join(USAGE_ROOT, STATS_NAME), bytes=delta)
+
+# NOTE Calls add with the change in size of every given path, once the block
+#      has written or removed them
+@contextlib.contextmanager
+def _tracking(paths, add):
+    before = [_size(path) for path in paths]
+    try:
+        yield
+    finally:
+        add([(path, _size(path) - size) for path, size in zip(paths, before)])
+
+# NOTE Accounts for the paths written or removed outside of a workspace
+def track(*paths):
+    return _tracking(paths, lambda deltas: account(sum(delta for path, delta in deltas if stored(path))))
+
+# NOTE The usage is a running counter, which is updated by every write, so the
+#      quota can be checked without walking the stores. Files removed by the
+#      janitor or by hand are only accounted for once the counter has been
+#      reconciled with a full walk.
+def usage():
+    return read_stats(os.path.join(USAGE_ROOT, STATS_NAME)).get('bytes', 0)
+
+def check_quota():
+    if WORKSPACE_QUOTA and usage() >= WORKSPACE_QUOTA:
+        raise FontieException(507, "storage quota exceeded")
+
+# NOTE Walks all stores and resets the counter to the result. The counters of
+#      workspaces that no longer exist are removed on the way.
+def reconcile():
+    size = 0
+    for root in set(root for root, prefix in STORES):
+        prefixes = tuple(prefix for r, prefix in STORES if r == root)
+        try:
+            entries = list(os.scandir(root))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(prefixes):
+                try:
+                    size += path_size(entry.path)
+                except OSError:
+                    # NOTE The entry has been removed while it was scanned
+                    pass
+    count_stats(os.path.join(USAGE_ROOT, STATS_NAME), reset=True, bytes=size)
+    try:
+        names = os.listdir(USAGE_ROOT)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if name.startswith(WORKSPACE_PREFIX) and not os.path.exists(os.path.join(WORKSPACE_ROOT, name)):
+            try:
+                os.remove(os.path.join(USAGE_ROOT, name))
+            except OSError:
+                pass
+    return size
+
+# INFO Private directory of a single job
+#
+#      Holds the working copies and intermediates of the fonts of one job, so
+#      jobs never share a directory and a job can be removed as a whole. Every
+#      path the job writes through track counts against the job quota, e.g.
+#      its package, and against the global quota if it is part of a store.
+#      The job counter is kept in a file, so it is shared by the processes of
+#      a parallel build. The global quota is checked by the callers before
+#      they start to store anything new. The janitor skips the workspace as
+#      long as it exists.
+class FontieWorkspace:
+    def __init__(self):
+        id = "%s%s" % (WORKSPACE_PREFIX, uuid.uuid4())
+        path = os.path.join(WORKSPACE_ROOT, id)
+        os.makedirs(path)
+        self.id = id
+        self.path = path
+        self._lock = hold(path)
+
+    # NOTE The lock stays with the process that created the workspace, the
+    #      workers of a parallel build are covered by it anyway
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def _add(self, deltas):
+        delta = sum(delta for path, delta in deltas)
+        if delta:
+            count_stats(os.path.join(USAGE_ROOT, self.id), bytes=delta)
+        account(sum(delta for path, delta in deltas if stored(path)))
+
+    def track(self, *paths):
+        return _tracking(paths, self._add)
+
+    def usage(self):
+        return read_stats(os.path.join(USAGE_ROOT, self.id)).get('bytes', 0)
+
+    def check(self):
+        if WORKSPACE_JOB_QUOTA and self.usage() > WORKSPACE_JOB_QUOTA:
+            raise FontieException(507, "job quota exceeded")
+
+    # NOTE The files left in the workspace are removed from the global counter
+    #      by the size of this single directory
+    def destroy(self, strict=True):
+        if self.path:
+            try:
+                with track(self.path):
+                    shutil.rmtree(self.path)
+                if os.path.exists(os.path.join(USAGE_ROOT, self.id)):
+                    os.remove(os.path.join(USAGE_ROOT, self.id))
+            except:
+                if strict: raise
+                traceback.print_exc()
+        if self._lock != None:
+            self._lock.close()
+            self._lock = None
+        self.id = None
+        self.path = None
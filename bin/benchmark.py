@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+#
+# Per-stage benchmark of the Fontie pipeline over a corpus of fonts
+#
+# Usage: fontforge -lang=py -script bin/benchmark.py [options] CORPUS...
+#
+# Every stage is timed on its own, starting from a freshly opened copy of the
+# original font, so the numbers of one stage do not depend on the stages that
+# ran before it. The results are written as JSON and can be compared against
+# the results of an earlier run, e.g. one made before a change.
+#
+
+import sys
+import os
+import time
+import json
+import argparse
+import platform
+import statistics
+import traceback
+
+import fontforge
+
+from FontieFont import FontieFont
+from FontiePackage import FontiePackage
+
+EXTENSIONS = [".ttf", ".otf", ".sfd", ".woff", ".woff2"]
+FIXES = ["name", "glyphs", "references", "metrics"]
+HINTING = ["gdi", "directwrite", "grayscale", "nohint"]
+OUTPUT = ["ttf", "otf", "woff", "woff2", "eot", "svg"]
+RANGES = ["0020-007F", "00A0-00FF", "20AC"]
+REPEAT = 3
+# NOTE Relative slowdown of the median above which a stage is reported as a
+#      regression when comparing against a baseline
+THRESHOLD = 0.1
+
+def corpus(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirnames, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1].lower() in EXTENSIONS:
+                        files.append(os.path.join(root, filename))
+        else:
+            files.append(path)
+    return files
+
+# NOTE The corpus should cover small and large, TTF and OTF, Latin and CJK
+#      fonts with and without references, so every font is described by
+#      these properties in the results
+def describe(path):
+    with open(path, 'rb') as file:
+        magic = file.read(4)
+    font = fontforge.open(path)
+    try:
+        glyphs = [glyph for glyph in font.glyphs() if glyph.isWorthOutputting()]
+        return {
+            'file': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'format': "otf" if magic == b"OTTO" else os.path.splitext(path)[1][1:].lower(),
+            'glyphs': len(glyphs),
+            'references': sum(1 for glyph in glyphs if glyph.references),
+            'cjk': any(0x4E00 <= glyph.unicode <= 0x9FFF for glyph in glyphs)
+        }
+    finally:
+        font.close()
+
+def summarize(runs):
+    return {
+        'runs': runs,
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'mean': statistics.mean(runs)
+    }
+
+class FontieBenchmark:
+    def __init__(self, repeat=REPEAT, ranges=RANGES):
+        self.repeat = repeat
+        self.ranges = ranges
+        self.timings = {}
+
+    def _time(self, stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.timings.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def _fresh(self, id):
+        font = FontieFont(id=id)
+        # NOTE Opening the font is not part of any stage
+        font.font
+        return font
+
+    def _run_fixes(self, id):
+        font = self._fresh(id)
+        try:
+            for fix in FIXES:
+                self._time("fix_%s" % fix, getattr(font, "fix_%s" % fix))
+        finally:
+            font.close(False)
+
+    def _run_hint(self, id, method):
+        font = self._fresh(id)
+        try:
+            # NOTE The TTF handed to ttfautohint is timed as export_ttf. The
+            #      hint cache is bypassed, since every run after the first
+            #      would only time a cache hit otherwise.
+            font._get_tmppath("ttf")
+            self._time("hint_%s" % method, font.hint, method, False)
+        finally:
+            font.close(False)
+
+    def _run_subset(self, id):
+        def subset(font):
+            font.subset(self.ranges)
+            font.fix_lookups()
+        font = self._fresh(id)
+        try:
+            self._time("subset", subset, font)
+        finally:
+            font.close(False)
+
+    def _run_export(self, id, outdir):
+        font = self._fresh(id)
+        try:
+            # NOTE The intermediates are generated by the first export that
+            #      needs them, which is therefore timed with its generation
+            for format in OUTPUT:
+                outpath = os.path.join(outdir, "benchmark.%s" % format)
+                self._time("export_%s" % format, getattr(font, "export_%s" % format), outpath)
+                os.remove(outpath)
+        finally:
+            font.close(False)
+
+    def _run_package(self, id):
+        options = {'font': [id], 'output': OUTPUT, 'css': ["create"], 'html': ["create"]}
+        package = FontiePackage()
+        try:
+            package.add(id)
+            package.convert(options['output'])
+            self._time("css", package.css, options['css'])
+            self._time("html", package.html, options['html'])
+            with open(os.devnull, 'wb') as file:
+                self._time("zip", package.zip, file)
+        finally:
+            package.destroy(False)
+
+    def run(self, path, outdir):
+        self.timings = {}
+        with open(path, 'rb') as file:
+            original = FontieFont(file=file)
+        try:
+            for i in range(self.repeat):
+                self._run_fixes(original.id)
+                for method in HINTING:
+                    self._run_hint(original.id, method)
+                self._run_subset(original.id)
+                self._run_export(original.id, outdir)
+                self._run_package(original.id)
+        finally:
+            original.destroy(False)
+        return dict((stage, summarize(runs)) for stage, runs in self.timings.items())
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, font in sorted(results['fonts'].items()):
+        if not name in baseline.get('fonts', {}):
+            continue
+        base = baseline['fonts'][name]['stages']
+        for stage, timing in sorted(font['stages'].items()):
+            if not stage in base or not base[stage]['median']:
+                continue
+            change = timing['median'] / base[stage]['median'] - 1
+            flag = "REGRESSION" if change > threshold else ""
+            print("%-40s %-20s %10.4fs %10.4fs %+7.1f%% %s" % (name, stage, base[stage]['median'], timing['median'], change * 100, flag))
+            if flag:
+                regressions.append((name, stage, change))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the Fontie pipeline")
+    parser.add_argument("corpus", nargs="+", help="font files or directories containing fonts")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="file the results are written to")
+    parser.add_argument("-b", "--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("-n", "--repeat", type=int, default=REPEAT, help="number of runs of every stage")
+    parser.add_argument("-r", "--ranges", default=",".join(RANGES), help="unicode ranges used by the subset stage")
+    parser.add_argument("-t", "--threshold", type=float, default=THRESHOLD, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+    benchmark = FontieBenchmark(args.repeat, args.ranges)
+    outdir = os.path.dirname(os.path.abspath(args.output))
+    results = {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'fontforge': fontforge.version(),
+        'repeat': args.repeat,
+        'ranges': args.ranges,
+        'hint_cache': False,
+        'fonts': {}
+    }
+    print("Hinting is timed without the hint cache")
+    failed = False
+    for path in corpus(args.corpus):
+        print("Benchmarking %s..." % path)
+        try:
+            results['fonts'][os.path.basename(path)] = {
+                'properties': describe(path),
+                'stages': benchmark.run(path, outdir)
+            }
+        except:
+            traceback.print_exc()
+            failed = True
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    print("Results written to %s" % args.output)
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
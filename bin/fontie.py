@@ -6,62 +6,147 @@
 import sys
 import io
 import os
-import tempfile
+import time
+import shutil
 import errno
 import socket
-import socketserver
 import http.server
-import cgi
+import urllib.parse
+import json
+import traceback
 
 from Daemon import Daemon
 from FontieException import FontieException
-from FontieFont import FontieFont
-from FontiePackage import FontiePackage
+from FontieFont import FontieFont, HINT_CACHE
+from FontiePackage import FontiePackage, PACKAGE_CACHE, CHECKPOINT_CACHE
+from FontiePool import FontiePool
+from FontieJob import FontieJob, JOB_PREFIX
+from FontieMultipart import FontieMultipart
+from FontieLog import FontieLog
+from FontieBatch import main as batch
+from FontieJanitor import FontieJanitor
+from FontieMetrics import METRICS_STORE, listen_backlog
+from FontieWorkspace import WORKSPACE_ROOT, usage
 
-class FontieHttpServer(socketserver.ForkingMixIn, http.server.HTTPServer):
-    pass
+WORKERS = 4
+WORKER_MAX_JOBS = 100
+WORKER_MAX_RSS = 1024*1024*1024
+UPLOAD_MAX_SIZE = 64*1024*1024
+FORM_MAX_SIZE = 1024*1024
+# NOTE Requests to other paths are counted as one route, so the metrics
+#      cannot be flooded with labels
+ROUTES = ["/font", "/package", "/job", "/cache", "/janitor", "/metrics"]
+
+class FontieChunkedWriter(io.RawIOBase):
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if len(data):
+            self.wfile.write(b"%x\r\n" % len(data))
+            self.wfile.write(data)
+            self.wfile.write(b"\r\n")
+        return len(data)
+
+    # NOTE The terminating chunk is only written on request, so an archive
+    #      that has been cut off by an error is never completed by closing
+    #      the writer
+    def finish(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+class FontieHttpServer(http.server.HTTPServer):
+    # NOTE Lets handle_request return regularly, so a worker notices that
+    #      it should stop even if there are no requests
+    timeout = 1
+
+    def __init__(self, *args, **kwargs):
+        super(FontieHttpServer, self).__init__(*args, **kwargs)
+        self.jobs = 0
+        self.log = FontieLog()
+
+    def finish_request(self, request, client_address):
+        self.jobs += 1
+        super(FontieHttpServer, self).finish_request(request, client_address)
 
 class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
-    def _fields_to_options(self, fields):
-        result = []
-        if isinstance(fields, list):
-            for f in fields:
-                if isinstance(f.file, io.BufferedRandom):
-                    result.append(f.file)
-                else:
-                    result.append(f.value)
-        else:
-            if isinstance(fields.file, io.BufferedRandom):
-                result.append(fields.file)
-            else:
-                result.append(fields.value)
-        return result
+    def send_response(self, code, message=None):
+        if self.status == None:
+            self.status = code
+        super(FontieRequestHandler, self).send_response(code, message)
+
+    def _observe(self, start):
+        path = urllib.parse.urlsplit(getattr(self, 'path', "")).path
+        route = path if path in ROUTES else path[:path.rfind("/")]
+        labels = {
+            'method': getattr(self, 'command', None) or "none",
+            'route': route if route in ROUTES else "other",
+            'status': self.status or "none"
+        }
+        METRICS_STORE.inc("fontie_requests_total", labels)
+        METRICS_STORE.time("fontie_request_duration_seconds", labels, start)
+
+    def _query(self):
+        return urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+
+    def _fields_to_package_options(self, fields):
+        options = {}
+        for name in ['font', 'fixes', 'ranges', 'shards', 'output', 'css', 'html']:
+            if name in fields:
+                options[name] = fields[name]
+        # NOTE An empty ranges field means that the font is not subset
+        if 'ranges' in options and not any(r.strip() for r in options['ranges']):
+            del options['ranges']
+        if 'hinting' in fields and fields['hinting'][0]:
+            options['hinting'] = fields['hinting'][0]
+        return options
+
+    # NOTE Releases the sockets inherited by a forked background job
+    def _detach(self):
+        os.close(self.server.socket.detach())
+        os.close(self.request.detach())
+
+    def _send_exception(self, e):
+        if e.original_exception:
+            print("Exception: %s" % e.original_exception)
+        print("Message: %s" % e.message)
+        result = "{\"message\":\"%s\"}" % e.message
+        self.send_response(e.code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(result.encode("utf-8"))
 
     def handle(self):
-        with tempfile.TemporaryFile('w+') as logfile:
-            try:
-                exception = False
-                stdout = os.dup(sys.stdout.fileno())
-                stderr = os.dup(sys.stderr.fileno())
-                sys.stdout.flush()
-                sys.stderr.flush()
-                os.dup2(logfile.fileno(), sys.stdout.fileno())
-                os.dup2(logfile.fileno(), sys.stderr.fileno())
-                super(FontieRequestHandler, self).handle()
-            except Exception as e:
-                if not (hasattr(e, 'errno') and e.errno == errno.EPIPE):
-                    exception = True
+        self.status = None
+        self.aborted = False
+        start = time.time()
+        METRICS_STORE.busy(True)
+        self.server.log.begin()
+        try:
+            exception = False
+            super(FontieRequestHandler, self).handle()
+        except Exception as e:
+            if not (hasattr(e, 'errno') and e.errno == errno.EPIPE):
+                exception = True
+                # NOTE A handler that failed before it responded still owes
+                #      the client a response
+                if self.status == None:
                     self.send_response(500)
-                raise
-            finally:
-                sys.stdout.flush()
-                sys.stderr.flush()
-                sys.stdout = os.fdopen(stdout, 'w')
-                sys.stderr = os.fdopen(stderr, 'w')
-                if exception:
-                    print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
-                    logfile.seek(0)
-                    print(logfile.read())
+                    self.end_headers()
+            raise
+        finally:
+            record = {
+                'method': getattr(self, 'command', None),
+                'path': getattr(self, 'path', None),
+                'status': self.status,
+                'duration': time.time() - start
+            }
+            self.server.log.end(record, exception or self.aborted or (self.status or 0) >= 500)
+            self._observe(start)
+            METRICS_STORE.busy(False)
+            METRICS_STORE.flush()
 
     def do_POST(self):
         path = self.path[:self.path.rfind("/")]
@@ -69,6 +154,8 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
             self.post_font()
         elif path == "/package":
             self.post_package()
+        elif path == "/job":
+            self.post_job()
         else:
             self.send_response(404)
 
@@ -76,6 +163,14 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
         path = self.path[:self.path.rfind("/")]
         if path == "/package":
             self.get_package()
+        elif path == "/job":
+            self.get_job()
+        elif path == "/cache":
+            self.get_cache()
+        elif path == "/janitor":
+            self.get_janitor()
+        elif path == "/metrics" or self.path == "/metrics":
+            self.get_metrics()
         else:
             self.send_response(404)
 
@@ -88,24 +183,20 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
 
     def post_font(self):
         try:
-            fields = cgi.FieldStorage(fp=self.rfile, headers=self.headers, environ={'REQUEST_METHOD':"POST"})
-            if not 'file' in fields:
+            multipart = FontieMultipart(self.rfile, self.headers, UPLOAD_MAX_SIZE)
+            for part in multipart.parts():
+                if part.name == 'file':
+                    font = FontieFont(file=part)
+                    break
+            else:
                 raise FontieException(400, 'missing file')
-            font = FontieFont(file=fields['file'].file)
             result = "{\"id\":\"%s\",\"name\":\"%s\"}" % (font.id, font.font.fullname)
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             self.wfile.write(result.encode("utf-8"))
         except FontieException as e:
-            if e.original_exception:
-                print("Exception: %s" % e.original_exception)
-            print("Message: %s" % e.message)
-            result = "{\"message\":\"%s\"}" % e.message
-            self.send_response(e.code)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(result.encode("utf-8"))
+            self._send_exception(e)
             if 'font' in locals() and font:
                 font.destroy(False)
         except:
@@ -115,39 +206,19 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
 
     def post_package(self):
         try:
-            fields = cgi.FieldStorage(fp=self.rfile, headers=self.headers, environ={'REQUEST_METHOD':"POST"})
+            fields = FontieMultipart(self.rfile, self.headers, FORM_MAX_SIZE).fields()
             if not 'font' in fields:
                 raise FontieException(400, 'missing fonts')
+            options = self._fields_to_package_options(fields)
             package = FontiePackage()
-            for font in self._fields_to_options(fields['font']):
-                package.add(font)
-            if 'fixes' in fields:
-                package.fix(self._fields_to_options(fields['fixes']))
-            if fields['hinting'].value:
-                package.hint(fields['hinting'].value)
-            if 'ranges' in fields:
-                package.subset(self._fields_to_options(fields['ranges']))
-            if 'output' in fields:
-                package.convert(self._fields_to_options(fields['output']))
-            if 'css' in fields:
-                package.css(self._fields_to_options(fields['css']))
-            if 'html' in fields:
-                package.html(self._fields_to_options(fields['html']))
-            package.close()
+            package.make(options)
             result = "{\"package\":\"%s\"}" % package.id
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             self.wfile.write(result.encode("utf-8"))
         except FontieException as e:
-            if e.original_exception:
-                print("Exception: %s" % e.original_exception)
-            print("Message: %s" % e.message)
-            result = "{\"message\":\"%s\"}" % e.message
-            self.send_response(e.code)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(result.encode("utf-8"))
+            self._send_exception(e)
             if 'package' in locals() and package:
                 package.destroy(False)
         except:
@@ -155,43 +226,126 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
                 package.destroy(False)
             raise
 
+    def post_job(self):
+        try:
+            fields = FontieMultipart(self.rfile, self.headers, FORM_MAX_SIZE).fields()
+            if not 'font' in fields:
+                raise FontieException(400, 'missing fonts')
+            job = FontieJob.submit(self._fields_to_package_options(fields), self._detach)
+            result = "{\"job\":\"%s\"}" % job.id
+            self.send_response(202)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(result.encode("utf-8"))
+        except FontieException as e:
+            self._send_exception(e)
+        except:
+            traceback.print_exc()
+            self._send_exception(FontieException(500, "internal error"))
+
+    def get_job(self):
+        try:
+            fields = self._query()
+            if not 'id' in fields:
+                raise FontieException(400, 'missing job id')
+            result = json.dumps(FontieJob(fields['id'][0]).status())
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(result.encode("utf-8"))
+        except FontieException as e:
+            self._send_exception(e)
+
     def get_package(self):
+        sent = False
         try:
-            # REF https://hg.python.org/cpython/file/3.5/Lib/cgi.py
-            fields = cgi.FieldStorage(environ={'REQUEST_METHOD':"GET", 'QUERY_STRING':self.path[self.path.find("?")+1:]})
+            fields = self._query()
             if not 'id' in fields:
                 raise FontieException(400, 'missing package id')
-            package = FontiePackage(fields['id'].value)
-            data = package.zip()
+            id = fields['id'][0]
+            # NOTE The package of a background job can be requested by the
+            #      id of the job as well
+            if id.startswith(JOB_PREFIX):
+                status = FontieJob(id).status()
+                if status['status'] != "done":
+                    raise FontieException(409, "package is not ready")
+                id = status['package']
+            package = FontiePackage(id)
+            # NOTE HTTP/1.0 clients get the archive until the connection is
+            #      closed, since they do not support chunked transfer encoding
+            chunked = self.request_version == "HTTP/1.1"
+            if chunked:
+                self.protocol_version = "HTTP/1.1"
             self.send_response(200)
             self.send_header('Content-Type', 'application/zip')
+            self.send_header('Connection', 'close')
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+                raw = FontieChunkedWriter(self.wfile)
+            else:
+                raw = self.wfile
             self.end_headers()
-            self.wfile.write(data.getvalue())
-            data.close()
+            sent = True
+            data = io.BufferedWriter(raw, 65536)
+            package.zip(data)
+            data.flush()
+            data.detach()
+            if chunked:
+                raw.finish()
             package.destroy()
-        except FontieException as e:
-            if e.original_exception:
-                print("Exception: %s" % e.original_exception)
-            print("Message: %s" % e.message)
-            result = "{\"message\":\"%s\"}" % e.message
-            self.send_response(e.code)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(result.encode("utf-8"))
+        except Exception as e:
             if 'package' in locals() and package:
                 package.destroy(False)
-        except:
-            if 'package' in locals() and package:
-                package.destroy(False)
-            raise
+            if sent:
+                # NOTE The status has been sent already, so the client can only
+                #      tell that the archive is incomplete from the connection
+                #      being closed without the terminating chunk
+                traceback.print_exc()
+                self.aborted = True
+                self.close_connection = True
+            elif isinstance(e, FontieException):
+                self._send_exception(e)
+            else:
+                raise
+
+    def get_cache(self):
+        stats = PACKAGE_CACHE.stats()
+        stats['hinting'] = HINT_CACHE.stats()
+        stats['checkpoints'] = CHECKPOINT_CACHE.stats()
+        result = json.dumps(stats)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(result.encode("utf-8"))
+
+    def get_janitor(self):
+        result = json.dumps(FontieJanitor().stats())
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(result.encode("utf-8"))
+
+    def get_metrics(self):
+        gauges = [
+            ("fontie_workers_busy", None, METRICS_STORE.workers_busy()),
+            ("fontie_requests_queued", None, listen_backlog(self.server.server_address[1])),
+            ("fontie_storage_bytes", None, usage()),
+            ("fontie_workspace_free_bytes", None, shutil.disk_usage(WORKSPACE_ROOT).free)
+        ]
+        for status, count in FontieJob.counts().items():
+            gauges.append(("fontie_jobs", {'status': status}, count))
+        result = METRICS_STORE.render(gauges)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.end_headers()
+        self.wfile.write(result.encode("utf-8"))
 
     def delete_font(self):
         try:
-            # REF https://hg.python.org/cpython/file/3.5/Lib/cgi.py
-            fields = cgi.FieldStorage(environ={'REQUEST_METHOD':"GET", 'QUERY_STRING':self.path[self.path.find("?")+1:]})
+            fields = self._query()
             if not 'id' in fields:
                 raise FontieException(400, 'missing font id')
-            font = FontieFont(id=fields['id'].value)
+            font = FontieFont(id=fields['id'][0])
             result = "{\"id\":\"%s\"}" % font.id
             font.destroy()
             self.send_response(200)
@@ -199,14 +353,7 @@ class FontieRequestHandler(http.server.BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(result.encode("utf-8"))
         except FontieException as e:
-            if e.original_exception:
-                print("Exception: %s" % e.original_exception)
-            print("Message: %s" % e.message)
-            result = "{\"message\":\"%s\"}" % e.message
-            self.send_response(e.code)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(result.encode("utf-8"))
+            self._send_exception(e)
             if 'font' in locals() and font:
                 font.destroy(False)
         except:
@@ -221,12 +368,15 @@ class FontieDaemon(Daemon):
 def run():
     print("Fontie is starting...")
     httpd = FontieHttpServer(("localhost", 8000), FontieRequestHandler)
-    result = httpd.serve_forever()
+    pool = FontiePool(httpd, WORKERS, WORKER_MAX_JOBS, WORKER_MAX_RSS, FontieJanitor())
+    result = pool.run()
     print("Fontie is shutting down (%d)..." % result)
     exit(result)
 
 if len(sys.argv) < 2:
     run()
+elif sys.argv[1] == "batch":
+    exit(batch(sys.argv[2:]))
 else:
     daemon = FontieDaemon("/var/run/fontie.pid")
     if sys.argv[1] == "start":
@@ -236,4 +386,4 @@ else:
     elif sys.argv[1] == "restart":
         daemon.restart()
     else:
-        print("expecting: fontie (start|stop|restart)")
+        print("expecting: fontie (start|stop|restart|batch)")
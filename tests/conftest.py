@@ -0,0 +1,63 @@
+import os
+import sys
+
+# NOTE The modules of fontie are not a package, they are run from bin
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "bin"))
+
+import io
+
+import pytest
+
+# NOTE A small TTF with an empty glyph, simple glyphs with on- and off-curve
+#      points, a glyph with instructions and a bounding box of its own and a
+#      composite glyph
+@pytest.fixture
+def ttf():
+    fontBuilder = pytest.importorskip("fontTools.fontBuilder")
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    from fontTools import ttLib
+    from fontTools.ttLib.tables import ttProgram
+    glyphs = {}
+    pen = TTGlyphPen(None)
+    glyphs[".notdef"] = pen.glyph()
+    pen = TTGlyphPen(None)
+    pen.moveTo((100, 0))
+    pen.lineTo((300, 700))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    pen.moveTo((200, 100))
+    pen.qCurveTo((300, 400), (400, 100))
+    pen.closePath()
+    glyphs["A"] = pen.glyph()
+    pen = TTGlyphPen(None)
+    pen.moveTo((-2000, -1500))
+    pen.qCurveTo((0, 3000), (2000, -1500), (0, -3000))
+    pen.closePath()
+    glyph = pen.glyph()
+    glyph.program = ttProgram.Program()
+    glyph.program.fromBytecode(b"\xb0\x01\x2f")
+    glyphs["O"] = glyph
+    pen = TTGlyphPen(glyphs)
+    pen.addComponent("A", (1, 0, 0, 1, 50, 20))
+    glyphs["Acyr"] = pen.glyph()
+    order = [".notdef", "A", "O", "Acyr"]
+    builder = fontBuilder.FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(order)
+    builder.setupCharacterMap({0x41: "A", 0x4f: "O", 0x410: "Acyr"})
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics(dict((name, (600, 0)) for name in order))
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": "Fontie Test", "styleName": "Regular", "fullName": "Fontie Test Regular", "version": "Version 1.0"})
+    builder.setupOS2(usWeightClass=700, fsType=0x0008, fsSelection=0x0001)
+    for i, name in enumerate(["bFamilyType", "bSerifStyle", "bWeight", "bProportion", "bContrast", "bStrokeVariation", "bArmStyle", "bLetterForm", "bMidline", "bXHeight"]):
+        setattr(builder.font["OS/2"].panose, name, i + 1)
+    builder.font["head"].macStyle = 0x0003
+    builder.setupPost()
+    file = io.BytesIO()
+    builder.save(file)
+    # NOTE A bounding box that differs from the points has to be stored
+    font = ttLib.TTFont(io.BytesIO(file.getvalue()), recalcBBoxes=False)
+    font["glyf"]["O"].xMin -= 10
+    file = io.BytesIO()
+    font.save(file)
+    return file.getvalue()
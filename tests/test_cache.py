@@ -0,0 +1,85 @@
+import os
+import time
+
+from FontieCache import FontieCache, count_stats, read_stats
+
+def _file(path, size):
+    with open(path, 'wb') as file:
+        file.write(b"x" * size)
+    return str(path)
+
+def _age(cache, key, seconds):
+    path = os.path.join(cache.root, key)
+    os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+def test_key():
+    cache = FontieCache("/nonexistent", 0, 0)
+    assert cache.key(["a"], {'b': 1, 'c': [2]}) == cache.key(["a"], {'c': [2], 'b': 1})
+    assert cache.key(["a"], {'b': 1}) != cache.key(["a"], {'b': "1"})
+    assert cache.key(b"ab", b"c") != cache.key(b"a", b"bc")
+    assert cache.key("1.0", 2) != cache.key("1.0", 3)
+
+def test_put_get(tmp_path):
+    cache = FontieCache(str(tmp_path / "cache"), 1024, 3600)
+    assert cache.get("a") == None
+    path = cache.put("a", _file(tmp_path / "a", 10))
+    assert cache.get("a") == path
+    with open(path, 'rb') as file:
+        assert file.read() == b"x" * 10
+    directory = tmp_path / "dir"
+    directory.mkdir()
+    _file(directory / "font", 20)
+    path = cache.put("b", str(directory))
+    assert os.path.getsize(os.path.join(cache.get("b"), "font")) == 20
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries'], stats['size']) == (2, 1, 2, 2, 30)
+
+def test_evict_least_recently_used(tmp_path):
+    cache = FontieCache(str(tmp_path / "cache"), 250, 3600)
+    cache.put("a", _file(tmp_path / "a", 100))
+    cache.put("b", _file(tmp_path / "b", 100))
+    _age(cache, "a", 200)
+    _age(cache, "b", 100)
+    # NOTE The hit makes a the most recently used entry
+    assert cache.get("a")
+    cache.put("c", _file(tmp_path / "c", 100))
+    assert [key for key in "abc" if cache.get(key)] == ["a", "c"]
+    stats = cache.stats()
+    assert (stats['evictions'], stats['reclaimed'], stats['size']) == (1, 100, 200)
+
+def test_expire_by_age(tmp_path):
+    cache = FontieCache(str(tmp_path / "cache"), 1024, 60)
+    cache.put("a", _file(tmp_path / "a", 10))
+    cache.put("b", _file(tmp_path / "b", 10))
+    _age(cache, "a", 120)
+    assert cache.get("a") == None
+    assert not os.path.exists(os.path.join(cache.root, "a"))
+    _age(cache, "b", 120)
+    cache.evict()
+    assert cache.stats()['entries'] == 0
+
+def test_account(tmp_path):
+    deltas = []
+    cache = FontieCache(str(tmp_path / "cache"), 150, 60, deltas.append)
+    cache.put("a", _file(tmp_path / "a", 100))
+    # NOTE An entry that is stored again is only accounted once
+    directory = tmp_path / "dir"
+    directory.mkdir()
+    _file(directory / "font", 40)
+    cache.put("b", str(directory))
+    cache.put("b", str(directory))
+    assert deltas == [100, 40]
+    cache.put("c", _file(tmp_path / "c", 50))
+    assert deltas == [100, 40, 50, -100]
+    _age(cache, "b", 120)
+    assert cache.get("b") == None
+    assert deltas == [100, 40, 50, -100, -40]
+
+def test_stats(tmp_path):
+    path = str(tmp_path / "stats" / ".stats")
+    assert read_stats(path) == {}
+    count_stats(path, hits=1)
+    count_stats(path, hits=2, misses=1)
+    assert read_stats(path) == {'hits': 3, 'misses': 1}
+    count_stats(path, reset=True, hits=0)
+    assert read_stats(path) == {'hits': 0, 'misses': 1}
@@ -0,0 +1,43 @@
+import io
+import struct
+
+import pytest
+
+from FontieEot import eot
+
+def _strings(data, offset, count):
+    strings = []
+    for i in range(count):
+        padding, size = struct.unpack("<HH", data[offset:offset + 4])
+        assert padding == 0
+        strings.append(data[offset + 4:offset + 4 + size].decode("utf-16-le"))
+        offset += 4 + size
+    return strings, offset
+
+def test_eot_header(ttf):
+    ttLib = pytest.importorskip("fontTools.ttLib")
+    font = ttLib.TTFont(io.BytesIO(ttf))
+    os2 = font.reader["OS/2"]
+    data = eot(ttf)
+    size, font_size, version, flags = struct.unpack("<IIII", data[:16])
+    assert (size, font_size, version, flags) == (len(data), len(ttf), 0x00020001, 0)
+    assert data[16:26] == os2[32:42]
+    charset, italic, weight, fstype, magic = struct.unpack("<BBIHH", data[26:36])
+    assert (charset, italic, weight, fstype, magic) == (1, 1, 700, 0x0008, 0x504C)
+    assert struct.unpack("<4I", data[36:52]) == struct.unpack(">4I", os2[42:58])
+    assert struct.unpack("<2I", data[52:60]) == struct.unpack(">2I", os2[78:86])
+    assert struct.unpack("<I", data[60:64])[0] == font["head"].checkSumAdjustment
+    assert data[64:80] == bytes(16)
+    assert data[-len(ttf):] == ttf
+
+def test_eot_names(ttf):
+    ttLib = pytest.importorskip("fontTools.ttLib")
+    font = ttLib.TTFont(io.BytesIO(ttf))
+    data = eot(ttf)
+    names, offset = _strings(data, 80, 4)
+    assert names == [font["name"].getDebugName(id) for id in [1, 2, 5, 4]]
+    assert names == ["Fontie Test", "Regular", "Version 1.0", "Fontie Test Regular"]
+    # NOTE The root string is empty and followed by the font data directly
+    root, offset = _strings(data, offset, 1)
+    assert root == [""]
+    assert offset == len(data) - len(ttf)
@@ -0,0 +1,137 @@
+import random
+import email.parser
+
+import pytest
+
+from FontieException import FontieException
+from FontieMultipart import FontieMultipart
+
+BOUNDARY = "----fontieBoundary7MA4YWxk"
+
+# NOTE Hands out the body in chunks of random size, like a socket does
+class ChunkedReader:
+    def __init__(self, data, seed):
+        self.data = data
+        self.random = random.Random(seed)
+
+    def read(self, size):
+        size = min(size, self.random.randint(1, 97))
+        result = self.data[:size]
+        self.data = self.data[size:]
+        return result
+
+def _headers(length, boundary=BOUNDARY):
+    return email.parser.Parser().parsestr("Content-Type: multipart/form-data; boundary=%s\nContent-Length: %d\n\n" % (boundary, length))
+
+def _body(parts, boundary=BOUNDARY):
+    body = b"preamble\r\n"
+    for name, filename, data in parts:
+        body += b"--%s\r\n" % boundary.encode("latin-1")
+        if filename:
+            body += b'Content-Disposition: form-data; name="%s"; filename="%s"\r\n' % (name.encode(), filename.encode())
+            body += b"Content-Type: application/octet-stream\r\n\r\n"
+        else:
+            body += b'Content-Disposition: form-data; name="%s"\r\n\r\n' % name.encode()
+        body += data + b"\r\n"
+    return body + b"--%s--\r\nepilogue" % boundary.encode("latin-1")
+
+# NOTE The file data contains line breaks and a delimiter that only misses
+#      its last character, so it looks like a boundary until its very end
+FONT = b"\x00\x01\r\n\r\n--" + BOUNDARY[:-1].encode() + b"x\r\n--\r\n" + bytes(range(256)) * 20
+PARTS = [
+    ("fixes", None, b"name"),
+    ("file", "a.ttf", FONT),
+    ("file", "b.ttf", b"\r\n" + FONT[::-1]),
+    ("fixes", None, b"glyphs"),
+    ("empty", None, b"")
+]
+
+def _read(multipart, seed):
+    generator = random.Random(seed)
+    result = []
+    for part in multipart.parts():
+        data = b""
+        chunk = part.read(generator.randint(1, 300))
+        while chunk:
+            data += chunk
+            chunk = part.read(generator.randint(1, 300))
+        result.append((part.name, part.filename, data))
+    return result
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunks(seed):
+    body = _body(PARTS)
+    multipart = FontieMultipart(ChunkedReader(body, seed), _headers(len(body)), len(body))
+    assert _read(multipart, seed) == PARTS
+
+# NOTE Hands out the body in two chunks, which are split at the given offset
+class SplitReader:
+    def __init__(self, data, split):
+        self.data = data
+        self.split = split
+
+    def read(self, size):
+        if self.split > 0:
+            size = min(size, self.split)
+            self.split -= size
+        result = self.data[:size]
+        self.data = self.data[size:]
+        return result
+
+def test_boundary_split_at_every_position():
+    body = _body(PARTS[:2])
+    for split in range(1, len(body)):
+        multipart = FontieMultipart(SplitReader(body, split), _headers(len(body)), len(body))
+        assert _read(multipart, split) == PARTS[:2]
+
+def test_fields():
+    body = _body(PARTS)
+    multipart = FontieMultipart(ChunkedReader(body, 1), _headers(len(body)), len(body))
+    fields = multipart.fields()
+    assert fields['fixes'] == ["name", "glyphs"]
+    assert len(fields['file']) == 2
+    assert fields['empty'] == [""]
+
+def test_part_read_all():
+    body = _body(PARTS)
+    multipart = FontieMultipart(ChunkedReader(body, 2), _headers(len(body)), len(body))
+    assert [part.read() for part in multipart.parts()] == [part[2] for part in PARTS]
+
+def test_skipped_parts():
+    body = _body(PARTS)
+    multipart = FontieMultipart(ChunkedReader(body, 3), _headers(len(body)), len(body))
+    for part in multipart.parts():
+        if part.filename == "b.ttf":
+            assert part.read() == PARTS[2][2]
+            break
+
+@pytest.mark.parametrize("cut", [10, 200, 3000, -20, -11])
+def test_truncated_body(cut):
+    body = _body(PARTS)
+    # NOTE The client closes the connection before Content-Length is reached
+    multipart = FontieMultipart(ChunkedReader(body[:cut], 4), _headers(len(body)), len(body))
+    with pytest.raises(FontieException) as info:
+        _read(multipart, 4)
+    assert info.value.code == 400
+
+@pytest.mark.parametrize("cut", [10, 200, 3000, -20, -11])
+def test_unterminated_body(cut):
+    body = _body(PARTS)[:cut]
+    multipart = FontieMultipart(ChunkedReader(body, 5), _headers(len(body)), len(body))
+    with pytest.raises(FontieException) as info:
+        _read(multipart, 5)
+    assert info.value.code == 400
+
+def test_limits():
+    body = _body(PARTS)
+    with pytest.raises(FontieException) as info:
+        FontieMultipart(ChunkedReader(body, 6), _headers(len(body)), len(body) - 1)
+    assert info.value.code == 413
+    headers = email.parser.Parser().parsestr("Content-Type: multipart/form-data; boundary=%s\n\n" % BOUNDARY)
+    with pytest.raises(FontieException) as info:
+        FontieMultipart(ChunkedReader(body, 6), headers, len(body))
+    assert info.value.code == 411
+    headers = email.parser.Parser().parsestr("Content-Type: text/plain\nContent-Length: 1\n\n")
+    with pytest.raises(FontieException) as info:
+        FontieMultipart(ChunkedReader(body, 6), headers, len(body))
+    assert info.value.code == 400
@@ -0,0 +1,95 @@
+import pytest
+
+from FontieException import FontieException
+from FontieRange import FontieRange, SHARDS, parse_shards, shard_range
+
+def test_shard_range_drops_references():
+    # NOTE The Cyrillic A references the Latin A, which is kept in the shard
+    unicodes = FontieRange.parse(SHARDS['cyrillic'])
+    assert str(shard_range(unicodes, [0x41, 0x410, 0x411, 0x412, 0x44F])) == "U+410-412,U+44F"
+
+def test_shard_range_only_present_glyphs():
+    unicodes = FontieRange.parse("2190-21FF")
+    assert str(shard_range(unicodes, [0x2190, 0x2192, 0x2193, 0x20])) == "U+2190,U+2192-2193"
+    assert not shard_range(unicodes, [0x41])
+
+def test_parse_shards():
+    shards = parse_shards(["latin", " arrows=2190-21FF,U+2B05 ", "greek-ext"])
+    assert [name for name, unicodes in shards] == ["latin", "arrows", "greek-ext"]
+    assert str(shards[1][1]) == "U+2190-21FF,U+2B05"
+    assert str(shards[2][1]) == "U+1F00-1FFF"
+    assert 0x131 in shards[0][1] and not 0x100 in shards[0][1]
+
+def test_parse_shards_overrides_predefined():
+    shards = parse_shards(["latin=0041-005A"])
+    assert str(shards[0][1]) == "U+41-5A"
+
+@pytest.mark.parametrize("shards, message", [
+    (["klingon"], "unknown shard"),
+    (["latin", "latin"], "duplicate shard"),
+    (["arrows=2190", "arrows=2191"], "duplicate shard"),
+    (["a b"], "invalid shard"),
+    (["arrows=xyz"], "invalid unicode range"),
+    (["arrows=,"], "empty unicode range")
+])
+def test_parse_shards_invalid(shards, message):
+    with pytest.raises(FontieException) as info:
+        parse_shards(shards)
+    assert info.value.code == 400
+    assert info.value.message == message
+
+def test_merge_overlapping_and_adjacent():
+    unicodes = FontieRange.parse(["0041-005A,0050-0060", "0061-007A", "00A0-00A5,00A7"])
+    assert unicodes.intervals == [(0x41, 0x7A), (0xA0, 0xA5), (0xA7, 0xA7)]
+    assert str(unicodes) == "U+41-7A,U+A0-A5,U+A7"
+
+def test_contained_interval():
+    assert FontieRange.parse("0020-007F,0041,0030-0039").intervals == [(0x20, 0x7F)]
+
+def test_inclusive_end():
+    unicodes = FontieRange.parse("U+A0-FF")
+    assert 0xA0 in unicodes and 0xFF in unicodes
+    assert not 0x9F in unicodes and not 0x100 in unicodes
+
+def test_wildcards():
+    unicodes = FontieRange.parse("U+4??")
+    assert unicodes.intervals == [(0x400, 0x4FF)]
+    assert str(FontieRange.parse("U+??")) == "U+0-FF"
+    assert str(FontieRange.parse("u+1f6??")) == "U+1F600-1F6FF"
+
+def test_contains():
+    unicodes = FontieRange.parse("0020-007F,20AC,1F600-1F64F")
+    assert [c in unicodes for c in [0x1F, 0x20, 0x7F, 0x80, 0x20AB, 0x20AC, 0x20AD, 0x1F600, 0x1F64F, 0x1F650]] == \
+        [False, True, True, False, False, True, False, True, True, False]
+    assert not 0 in FontieRange()
+
+def test_from_codepoints():
+    unicodes = FontieRange.from_codepoints([0x43, 0x41, 0x42, 0x42, 0x45, 0x10FFFF])
+    assert unicodes.intervals == [(0x41, 0x43), (0x45, 0x45), (0x10FFFF, 0x10FFFF)]
+    assert not FontieRange.from_codepoints([])
+
+@pytest.mark.parametrize("ranges", ["U+0-10FFFF", "U+41-7A,U+A0-A5,U+A7", "U+20AC", "U+400-4FF,U+1F600-1F64F"])
+def test_str_round_trip(ranges):
+    unicodes = FontieRange.parse(ranges)
+    assert str(unicodes) == ranges
+    assert FontieRange.parse(str(unicodes)).intervals == unicodes.intervals
+
+def test_parse_range():
+    unicodes = FontieRange.parse("0041")
+    assert FontieRange.parse(unicodes) is unicodes
+
+@pytest.mark.parametrize("ranges, message", [
+    ("", "empty unicode range"),
+    ([], "empty unicode range"),
+    (" , ,", "empty unicode range"),
+    ("007F-0020", "invalid unicode range"),
+    ("110000", "invalid unicode range"),
+    ("0041-110000", "invalid unicode range"),
+    ("4??-500", "invalid unicode range"),
+    ("U+XYZ", "invalid unicode range")
+])
+def test_parse_invalid(ranges, message):
+    with pytest.raises(FontieException) as info:
+        FontieRange.parse(ranges)
+    assert info.value.code == 400
+    assert info.value.message == message
@@ -0,0 +1,102 @@
+import io
+from collections import namedtuple
+
+import pytest
+
+from FontieSvg import _number, _coordinates, _contour, _kerning
+
+Point = namedtuple("Point", ["x", "y", "on_curve"])
+
+class Contour(list):
+    def __init__(self, points, closed=True, is_quadratic=True):
+        super().__init__(Point(*point) for point in points)
+        self.closed = closed
+        self.is_quadratic = is_quadratic
+
+@pytest.mark.parametrize("value, expected", [
+    (1.0, "1"),
+    (-0.5, "-.5"),
+    (0.25, ".25"),
+    (12.5, "12.5"),
+    (-3.333, "-3.33"),
+    (0.004, "0"),
+    (1.999, "2")
+])
+def test_number(value, expected):
+    assert _number(value) == expected
+
+def test_coordinates():
+    assert _coordinates((1, 2), (-3, 0.5), (0.5, 0.25)) == "1 2-3 .5.5.25"
+
+def test_contour_closed_lines():
+    # NOTE The last line is drawn by the closepath
+    assert _contour(Contour([(0, 0, True), (5, 0, True), (5, 5, True)])) == "M0 0L5 0L5 5Z"
+
+def test_contour_off_curve_start():
+    contour = Contour([(5, 5, False), (10, 0, True), (10, 10, False), (0, 10, True)])
+    assert _contour(contour) == "M10 0Q10 10 0 10Q5 5 10 0Z"
+
+def test_contour_off_curve_only():
+    contour = Contour([(0, 0, False), (10, 0, False), (10, 10, False), (0, 10, False)])
+    assert _contour(contour) == "M0 5Q0 0 5 0Q10 0 10 5Q10 10 5 10Q0 10 0 5Z"
+
+def test_contour_implied_points():
+    contour = Contour([(0, 0, True), (2, 4, False), (6, 4, False), (8, 0, True)])
+    assert _contour(contour) == "M0 0Q2 4 4 4Q6 4 8 0Z"
+
+def test_contour_cubic():
+    contour = Contour([(0, 0, True), (1, 2, False), (3, 2, False), (4, 0, True)], is_quadratic=False)
+    assert _contour(contour) == "M0 0C1 2 3 2 4 0Z"
+
+def test_contour_open():
+    contour = Contour([(1, 1, False), (0, 0, True), (5, 5, False), (10, 0, True), (12, 2, False)], closed=False)
+    assert _contour(contour) == "M0 0Q5 5 10 0"
+
+def test_contour_degenerate():
+    assert _contour(Contour([(0, 0, True)])) == ""
+    assert _contour(Contour([(0, 0, False), (1, 1, False)], closed=False)) == ""
+
+class Glyph:
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def getPosSub(self, subtable):
+        return [(subtable, "Pair", other, 0, 0, advance, 0, 0, 0, 0, 0) for other, advance in self.pairs]
+
+# NOTE Implements the part of the fontforge API the kerning is read from
+class Font:
+    gpos_lookups = ["kern pairs", "kern classes", "mark"]
+
+    def __init__(self):
+        self.glyphs = {
+            'A': Glyph([('V', -80), ('W', 0), ('gone', -10)]),
+            'V': Glyph([('A', -70)]),
+            'W': Glyph([])
+        }
+
+    def __getitem__(self, name):
+        return self.glyphs[name]
+
+    def getLookupInfo(self, lookup):
+        if lookup == "mark":
+            return ("gpos_mark2base", (), (("mark", (("latn", ("dflt",)),)),))
+        return ("gpos_pair", (), (("kern", (("latn", ("dflt",)),)),))
+
+    def getLookupSubtables(self, lookup):
+        return [lookup + " subtable"]
+
+    def isKerningClass(self, subtable):
+        return subtable == "kern classes subtable"
+
+    def getKerningClass(self, subtable):
+        return ((None, ("A", "gone")), (None, ("V", "W"), ("A",)), (0, 0, 0, 0, -40, 15))
+
+def test_kerning():
+    file = io.StringIO()
+    _kerning(Font(), set(["A", "V", "W"]), file)
+    assert file.getvalue() == (
+        '<hkern g1="A" g2="V" k="80"/>'
+        '<hkern g1="V" g2="A" k="70"/>'
+        '<hkern g1="A" g2="V,W" k="40"/>'
+        '<hkern g1="A" g2="A" k="-15"/>'
+    )
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+fontforge = pytest.importorskip("fontforge")
+
+from FontieFont import ttf_digest
+
+def _font():
+    font = fontforge.font()
+    font.familyname = "Fontie Test"
+    font.fontname = "FontieTest-Regular"
+    font.fullname = "Fontie Test Regular"
+    glyph = font.createChar(0x6f, "o")
+    pen = glyph.glyphPen()
+    pen.moveTo((100, 0))
+    pen.lineTo((100, 500))
+    pen.lineTo((400, 500))
+    pen.lineTo((400, 0))
+    pen.closePath()
+    glyph.width = 500
+    return font
+
+# NOTE The head and FFTM tables store the creation time of the font with a
+#      resolution of one second, so the second font is created later
+def test_generated_twice(tmp_path):
+    first = str(tmp_path / "first.ttf")
+    second = str(tmp_path / "second.ttf")
+    for path in [first, second]:
+        if path == second:
+            time.sleep(1.5)
+        font = _font()
+        font.generate(path)
+        font.close()
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() != b.read()
+    assert ttf_digest(first) == ttf_digest(second)
+
+def test_different_glyphs(tmp_path):
+    font = _font()
+    first = str(tmp_path / "first.ttf")
+    second = str(tmp_path / "second.ttf")
+    font.generate(first)
+    font["o"].width = 600
+    font.generate(second)
+    font.close()
+    assert ttf_digest(first) != ttf_digest(second)
@@ -0,0 +1,117 @@
+import io
+import struct
+import hashlib
+import zlib
+
+import pytest
+
+from FontieWoff import woff, woff2, read_sfnt, brotli
+
+# NOTE Builds an sfnt of the given tables in the given order with made up
+#      checksums, which the encoders have to copy as they are
+def _sfnt(tables):
+    offset = 12 + 16 * len(tables)
+    directory = b""
+    data = b""
+    for i, (tag, table) in enumerate(tables):
+        directory += struct.pack(">4sIII", tag, 0x1000 + i, offset + len(data), len(table))
+        data += table + b"\0" * (-len(table) % 4)
+    return struct.pack(">IHHHH", 0x00010000, len(tables), 0, 0, 0) + directory + data
+
+SFNT = _sfnt([
+    (b"name", b"fontie " * 40),
+    (b"cmap", b"\x8f\x1d\x03"),
+    (b"OS/2", b"".join(hashlib.sha256(bytes([i])).digest() for i in range(16)) + b"\x01")
+])
+
+def _woff_directory(data):
+    count = struct.unpack(">H", data[12:14])[0]
+    return [struct.unpack(">4sIIII", data[44 + 20*i:64 + 20*i]) for i in range(count)]
+
+def test_woff_header():
+    data = woff(SFNT)
+    signature, flavor, length, count, reserved, size, major, minor = struct.unpack(">4sIIHHIHH", data[:24])
+    assert (signature, flavor, length, count, reserved) == (b"wOFF", 0x00010000, len(data), 3, 0)
+    assert size == len(SFNT)
+    assert (major, minor) == (1, 0)
+    assert data[24:44] == bytes(20)
+
+def test_woff_directory():
+    data = woff(SFNT)
+    directory = _woff_directory(data)
+    assert [entry[0] for entry in directory] == [b"OS/2", b"cmap", b"name"]
+    offset = 44 + 20 * len(directory)
+    for tag, start, length, original, checksum in directory:
+        assert start == offset
+        offset += length + (-length % 4)
+    assert offset == len(data)
+    flavor, tables = read_sfnt(SFNT)
+    for tag, start, length, original, checksum in directory:
+        assert checksum == tables[tag][0]
+        assert original == len(tables[tag][1])
+
+def test_woff_padding():
+    data = woff(SFNT)
+    assert len(data) % 4 == 0
+    for tag, start, length, original, checksum in _woff_directory(data):
+        assert start % 4 == 0
+        padding = -length % 4
+        assert data[start + length:start + length + padding] == bytes(padding)
+
+def test_woff_compression():
+    flavor, tables = read_sfnt(SFNT)
+    data = woff(SFNT)
+    for tag, start, length, original, checksum in _woff_directory(data):
+        table = tables[tag][1]
+        block = data[start:start + length]
+        # NOTE zlib does not shrink cmap and OS/2, they are stored as they are
+        if tag == b"name":
+            assert length < original
+            assert zlib.decompress(block) == table
+        else:
+            assert length == original
+            assert block == table
+
+def _woff2_font(ttf):
+    if brotli == None:
+        pytest.skip("woff2 encoding requires the brotli module")
+    ttLib = pytest.importorskip("fontTools.ttLib")
+    return ttLib.TTFont(io.BytesIO(woff2(ttf)))
+
+def test_woff2_directory_order(ttf):
+    font = _woff2_font(ttf)
+    tags = list(font.reader.tables)
+    assert tags.index("loca") == tags.index("glyf") + 1
+    others = [tag for tag in tags if tag != "loca"]
+    assert others == sorted(others)
+
+def test_woff2_round_trip(ttf):
+    font = _woff2_font(ttf)
+    ttLib = pytest.importorskip("fontTools.ttLib")
+    original = ttLib.TTFont(io.BytesIO(ttf))
+    assert font.reader.tables["glyf"].transformed
+    assert font.getGlyphOrder() == original.getGlyphOrder()
+    for name in original.getGlyphOrder():
+        glyph = font["glyf"][name]
+        expected = original["glyf"][name]
+        assert glyph.numberOfContours == expected.numberOfContours, name
+        if expected.numberOfContours == 0:
+            continue
+        assert (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax) == (expected.xMin, expected.yMin, expected.xMax, expected.yMax), name
+        if expected.isComposite():
+            assert [(c.glyphName, c.x, c.y) for c in glyph.components] == [(c.glyphName, c.x, c.y) for c in expected.components]
+        else:
+            assert list(glyph.coordinates) == list(expected.coordinates), name
+            assert list(glyph.endPtsOfContours) == list(expected.endPtsOfContours), name
+            assert [flag & 0x01 for flag in glyph.flags] == [flag & 0x01 for flag in expected.flags], name
+            assert glyph.program.getBytecode() == expected.program.getBytecode(), name
+    flavor, tables = read_sfnt(ttf)
+    for tag, (checksum, data) in tables.items():
+        if tag in [b"glyf", b"loca", b"head"]:
+            continue
+        assert font.reader[tag.decode("ascii")] == data, tag
+    # NOTE Only bit 11 of the flags is set by the transform
+    head = font.reader["head"]
+    data = tables[b"head"][1]
+    assert head[:16] == data[:16] and head[18:] == data[18:]
+    assert head[16:18] == bytes([data[16] | 0x08, data[17]])